@@ -13,10 +13,6 @@ try:
 
     from lib.config import versioninfo
     from lib.errors import ErrorHelp, DBWorkerFailed, CustomException
-    from lib.jsonfile import buildinfo
-    from modules.collector import collect_wrapper
-    from modules.updater import update
-    from modules.tools import cleanup_archives, run_sql, completions
 
 except ImportError as e:
     print(e)
@@ -26,8 +22,21 @@ sys.dont_write_bytecode = True
 
 logging.basicConfig(level=logging.DEBUG, format="%(levelname)-8s: %(message)s", datefmt='%Y-%m-%d %I:%M:%S')
 
+def load(module, name):
+    """
+    Import a function only when it is needed. This keeps startup fast for options
+    like --version, --error, --script and --complete
+    """
+    try:
+        return getattr(__import__(module, fromlist=[name]), name)
+
+    except ImportError as e:
+        print(e)
+        sys.exit(10)
+
 def printversion():
     """Show version information"""
+    buildinfo = load('lib.buildinfo', 'buildinfo')
     print ('Author:    {0}'.format(versioninfo['author']))
     print ('Copyright: {0}'.format(versioninfo['copyright']))
     print ('License:   {0}'.format(versioninfo['license']))
@@ -48,14 +57,22 @@ def main():
     parser.add_argument("-u", "--user",       type=str,                   help="Switch to user (if run as root)")
     parser.add_argument(      "--filename",   type=str,                   help="output filename or full file path, default dbcollect-<hostname>-<timestamp>.zip")
     parser.add_argument(      "--cleanup",    action="store_true",        help="Remove old dbcollect zipfiles from /tmp")
+    parser.add_argument(      "--rewrite",    type=str,                   help="Rewrite a dbcollect zipfile (with --strip and/or --compression) to --filename or <zip>-rewrite.zip", metavar='<zip>')
+    parser.add_argument(      "--compression", type=str, choices=('store', 'deflate', 'bzip2', 'lzma'), help="Compression for --rewrite (default keep)")
     parser.add_argument(      "--tempdir",    type=str, default='/tmp',   help="TEMP directory, default /tmp")
     parser.add_argument("-d", "--days",       type=int, default=10,       help="Number of days ago to START collect of AWR data (default 10, max 999)")
     parser.add_argument(      "--end_days",   type=int, default=0,        help="Number of days ago to END AWR collect period, default 0, max 999")
+    parser.add_argument(      "--sar-days",   type=int,                   help="Number of days ago to START collect of SAR data (default same as --days)")
+    parser.add_argument(      "--sar-end-days", type=int,                 help="Number of days ago to END SAR collect period (default same as --end_days)")
     parser.add_argument(      "--logons",     type=str,                   help="Use logons file", metavar='<file>')
     parser.add_argument(      "--orahome",    type=str,                   help="ORACLE_HOME to run SQL*Plus (comma separated for multiple)", metavar='<dir>')
     parser.add_argument(      "--license-ok", action="store_true",        help="Override Diagnostics Pack detection (always generate AWRs). Diagnostics Pack required!")
     parser.add_argument(      "--statspack",  action="store_true",        help="Prefer Statspack reports even if AWR usage is detected")
     parser.add_argument(      "--strip",      action="store_true",        help="Strip SQL sections from AWR reports")
+    parser.add_argument(      "--awr-format", type=str, default='html', choices=('html', 'text'), help="AWR report format (default html)")
+    parser.add_argument(      "--awr-export", action="store_true",        help="Export the AWR repository tables (dba_hist) instead of generating AWR reports")
+    parser.add_argument(      "--peak",       type=str,                   help="Generate AWR reports only for the N (or P%%) busiest intervals by DB time per instance", metavar='N|P%')
+    parser.add_argument(      "--granularity", type=int,                  help="Combine consecutive snapshot intervals into reports of at least MIN minutes", metavar='MIN')
     parser.add_argument(      "--no-rac",     action="store_true",        help="Generate AWRs for local instance only (then run dbcollect on all nodes)")
     parser.add_argument(      "--no-stby",    action="store_true",        help="Generate AWRs for primary DB only (ignore standby DB)")
     parser.add_argument(      "--no-awr",     action="store_true",        help="Skip AWR reports")
@@ -78,6 +95,9 @@ def main():
     parser.add_argument(      "--error",      type=str,                   help="Get info on error, warning or informational message (i.e., E001)", metavar='<error>')
     args = parser.parse_args()
 
+    if args.peak and not args.peak.rstrip('%').isdigit():
+        parser.error('--peak requires a number of intervals or a percentage (i.e., 24 or 10%)')
+
     if not (args.quiet or args.script or args.complete or args.error):
         print('dbcollect {0} - collect Oracle AWR/Statspack, database and system info'.format(versioninfo['version']))
         sys.stdout.flush()
@@ -86,21 +106,30 @@ def main():
         printversion()
 
     elif args.update:
+        update = load('modules.updater', 'update')
         update(versioninfo['version'])
 
     elif args.cleanup:
+        cleanup_archives = load('modules.tools', 'cleanup_archives')
         cleanup_archives(args)
 
+    elif args.rewrite:
+        rewrite = load('modules.rewrite', 'rewrite')
+        rewrite(args)
+
     elif args.complete:
+        completions = load('modules.tools', 'completions')
         completions(args)
 
     elif args.script:
+        run_sql = load('modules.tools', 'run_sql')
         run_sql(args)
 
     elif args.error:
         ErrorHelp.help(args.error)
 
     else:
+        collect_wrapper = load('modules.collector', 'collect_wrapper')
         try:
             collect_wrapper(args)
 
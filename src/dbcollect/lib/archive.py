@@ -5,6 +5,7 @@ License: GPLv3+
 """
 
 import os, logging
+from threading import Lock
 from datetime import datetime
 from zipfile import ZipFile, ZIP_DEFLATED
 
@@ -21,6 +22,7 @@ class Archive():
     def __init__(self, args):
         self.prefix = os.uname()[1]
         self.path   = self.filename(args)
+        self.lock   = Lock() # Collection phases may write concurrently
 
         logging.info('Zip file is {0}'.format(self.path))
 
@@ -59,7 +61,8 @@ class Archive():
             return
 
         try:
-            self.zip.write(path, fulltag)
+            with self.lock:
+                self.zip.write(path, fulltag)
 
         except OSError as e:
             if not ignore:
@@ -72,7 +75,8 @@ class Archive():
     def writestr(self, tag, data):
         # Store a string in the archive using tag
         try:
-            self.zip.writestr(os.path.join(self.prefix, tag.lstrip('/')), data)
+            with self.lock:
+                self.zip.writestr(os.path.join(self.prefix, tag.lstrip('/')), data)
 
         except Exception as e: # pylint: disable=broad-exception-caught
             logging.warning(Errors.W003, tag, str(e))
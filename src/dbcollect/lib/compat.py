@@ -6,7 +6,8 @@ License: GPLv3+
 
 # pylint: disable=unspecified-encoding,consider-using-with,unused-import,ungrouped-imports,too-few-public-methods
 
-import sys, os, re, errno, logging, time, json
+import sys, os, re, stat, errno, logging, time, json
+from threading import RLock
 from pkgutil import get_data
 from subprocess import Popen, PIPE
 
@@ -18,6 +19,13 @@ except ImportError:
     # Python 2
     from Queue import Empty, Full
 
+try:
+    # Python 3.5+
+    from os import scandir
+
+except ImportError:
+    scandir = None
+
 try:
     # Python 3
     from subprocess import TimeoutExpired
@@ -34,6 +42,9 @@ class Completed():
         self.stderr = stderr
         self.returncode = returncode
 
+# Collection phases run concurrently, each with its own Progress on the same console line
+_console = RLock() # Reentrant: __del__ may run (garbage collection) while the lock is held
+
 class Progress():
     """Show a non-moving progress message, wipe it after done"""
     def __init__(self, args):
@@ -46,8 +57,9 @@ class Progress():
 
     def clear(self):
         if self.debug is False:
-            sys.stdout.write('\033[2K\033[G')
-            sys.stdout.flush()
+            with _console:
+                sys.stdout.write('\033[2K\033[G')
+                sys.stdout.flush()
 
     def message(self, msg, debug=True):
         if msg and debug:
@@ -56,8 +68,9 @@ class Progress():
         if self.quiet is True:
             return
 
-        sys.stdout.write('\033[2K{0}\033[G'.format(msg))
-        sys.stdout.flush()
+        with _console:
+            sys.stdout.write('\033[2K{0}\033[G'.format(msg))
+            sys.stdout.flush()
         time.sleep(0.05)
 
 class LinuxRelease():
@@ -140,6 +153,25 @@ def listdir(directory):
         return []
     return sorted(os.listdir(directory))
 
+def listentries(directory):
+    """
+    Return (name, path, is_dir, is_symlink) for all entries in directory, sorted by name.
+    Uses scandir where available, so no extra stat calls are needed for the file types.
+    Directory symlinks are not reported as directories.
+    """
+    entries = []
+    if scandir is not None:
+        for entry in scandir(directory):
+            entries.append((entry.name, entry.path, entry.is_dir(follow_symlinks=False), entry.is_symlink()))
+
+    else:
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            mode = os.lstat(path).st_mode
+            entries.append((name, path, stat.S_ISDIR(mode), stat.S_ISLNK(mode)))
+
+    return sorted(entries)
+
 def popen(cmd, **kwargs):
     """Wrapper for Popen depending on Python version. On Python3, set default encoding"""
     if sys.version_info[0] == 2:
@@ -147,17 +179,28 @@ def popen(cmd, **kwargs):
 
     return Popen(cmd, encoding='utf-8', errors='replace', **kwargs)
 
-def get_pkg_resource(package, resource):
-    """Get a file from the zipapp package (such as an SQL script)"""
-    if sys.version_info[0] == 2:
-        return get_data(package, resource)
+# Registry of package resources that are already loaded
+_resources = {}
+
+def get_pkg_resource(package, resource, cached=True):
+    """
+    Get a file from the zipapp package (such as an SQL script)
+    Resources are read from the zipapp only once and kept in memory, unless cached=False
+    """
+    key = (package, resource)
+    if cached and key in _resources:
+        return _resources[key]
 
     data = get_data(package, resource)
 
     if data is None:
         raise ValueError('Resource not found')
 
-    return data.decode()
+    if sys.version_info[0] != 2:
+        data = data.decode()
+
+    _resources[key] = data
+    return data
 
 def strerror(_errno):
     """Wrapper for strerror"""
@@ -7,16 +7,20 @@ function _dbcollect() {
   cur="${COMP_WORDS[COMP_CWORD]}"
   prev="${COMP_WORDS[COMP_CWORD-1]}"
   cmd="${COMP_WORDS[1]}"
-  opts1="--version --update --cleanup --error"
-  opts="--user --filename --days --logons --orahome --nmon --script --skip-sql --skip-cmd --tasks --timeout --include --exclude"
-  flags="--debug --quiet --license-ok --strip --no-rac --no-stby --no-awr --no-sar --no-ora --no-sys --no-root --no-acct --no-orainv --no-oratab --no-timeout"
+  opts1="--version --update --cleanup --rewrite --error"
+  opts="--user --filename --days --end_days --sar-days --sar-end-days --logons --orahome --nmon --script --skip-sql --skip-cmd --tasks --timeout --compression --awr-format --peak --granularity --include --exclude"
+  flags="--debug --quiet --license-ok --strip --awr-export --no-rac --no-stby --no-awr --no-sar --no-ora --no-sys --no-root --no-acct --no-orainv --no-oratab --no-timeout"
   case $prev in
      --cleanup|--version|--update) ;;
      --error)    COMPREPLY=($(compgen -W "$(dbcollect --error list)" -- $cur)) ;;
      --user)     COMPREPLY=($(compgen -W "root nobody $(ps -ho user -q $(pgrep -d, pmon_))" -- $cur)) ;;
      --tempdir)  COMPREPLY=($(compgen -W "/var/tmp /tmp" -- $cur)) ;;
      --days)     COMPREPLY=($(compgen -W "20 30 90 5" -- $cur)) ;;
+     --sar-days) COMPREPLY=($(compgen -W "20 30 90 5" -- $cur)) ;;
      --nmon)     COMPREPLY=($(compgen -o plusdirs -o filenames -f -- $cur)) ;;
+     --rewrite)  COMPREPLY=($(compgen -o plusdirs -o filenames -f -X '!*.zip' -- $cur)) ;;
+     --awr-format) COMPREPLY=($(compgen -W "html text" -- $cur)) ;;
+     --compression) COMPREPLY=($(compgen -W "store deflate bzip2 lzma" -- $cur)) ;;
      --script)   COMPREPLY=($(compgen -W "$(dbcollect --script list)" -- $cur)) ;;
      --skip-sql) COMPREPLY=($(compgen -W "$(dbcollect --script list)" -- $cur)) ;;
      --include)  COMPREPLY=($(compgen -W "$(ps -eo args | awk -F_ '/^ora_pmon/ {print $NF}')" -- $cur)) ;;
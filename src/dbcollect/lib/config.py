@@ -4,9 +4,41 @@ Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
 License: GPLv3+
 """
 
-DBCOLLECT_LOG     = '/tmp/dbcollect.log'
-ROOTQUEUE_TIMEOUT = 10  # must be lower than the workqueue timeout
-WORKQUEUE_TIMEOUT = 120 # must exceed max OS command timeout (60s)
+DBCOLLECT_LOG      = '/tmp/dbcollect.log'
+KEEPALIVE_INTERVAL = 10  # root worker heartbeat, must be lower than the workqueue timeout
+WORKQUEUE_TIMEOUT  = 120 # max time without notices from the root worker
+DETECT_TASKS       = 8   # max concurrent SQL*Plus sessions for instance detection
+COMMAND_TASKS      = 4   # max concurrent OS commands
+
+# Resource classes for the collection phases: max number of phases using the resource at the same time (0 = number of CPUs)
+phase_resources = { 'cpu': 0, 'db': 1, 'disk': 2 }
+
+# Hints for running OS commands concurrently, by base command:
+# cost  - relative run time (default 1), expensive commands are started first
+# limit - max number of concurrent runs of the command (default no limit)
+command_hints = {
+    'rpm':       { 'cost': 10, 'limit': 1 },
+    'dpkg':      { 'cost': 5,  'limit': 1 },
+    'lshw':      { 'cost': 10, 'limit': 1 },
+    'lvm':       { 'cost': 5,  'limit': 1 },
+    'vgs':       { 'cost': 5,  'limit': 1 },
+    'pvs':       { 'cost': 5,  'limit': 1 },
+    'lvs':       { 'cost': 5,  'limit': 1 },
+    'multipath': { 'cost': 5,  'limit': 1 },
+    'dmidecode': { 'cost': 3 },
+    'dmesg':     { 'cost': 2 },
+    'lsscsi':    { 'cost': 2 },
+    'lspci':     { 'cost': 2 },
+    'prtconf':   { 'cost': 5 },
+    'prtdiag':   { 'cost': 5 },
+    'svmon':     { 'cost': 3 },
+    'iostat':    { 'cost': 3 },
+    'machinfo':  { 'cost': 3 },
+    'ioscan':    { 'cost': 5,  'limit': 1 },
+    'vgdisplay': { 'cost': 5,  'limit': 1 },
+    'pvdisplay': { 'cost': 5,  'limit': 1 },
+    'lvdisplay': { 'cost': 5,  'limit': 1 },
+}
 
 versioninfo = {
     'author': "Bart Sjerps <info@dirty-cache.com>",
@@ -218,3 +250,16 @@ hpux_config = {
         '/etc/oratab',
     ],
 }
+
+# AWR repository export (--awr-export): one script per dba_hist view in sql/awrexport
+awrexport_config = [
+    'snapshots.sql',
+    'sysstat.sql',
+    'system_event.sql',
+    'osstat.sql',
+    'sys_time_model.sql',
+    'sysmetric_summary.sql',
+    'iostat_function.sql',
+    'sga.sql',
+    'pgastat.sql',
+]
@@ -3,11 +3,14 @@ detect.py - Detect and setup running Oracle instances
 Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
 License: GPLv3+
 """
-import os, re, logging, pwd, grp
+import os, re, logging, platform, pwd, grp
 
 from lib.errors import Errors, CustomException, SQLError, OracleNotAvailable, LogonDenied, SQLConnectionError, SQLPlusError, SQLTimeout
+from lib.config import DETECT_TASKS
 from lib.compat import load_file, load_files, execute
+from lib.multiproc import parallel
 from lib.sqlplus import sqlplus
+from lib.user import getuser, getgroup
 
 def sqlplus_status(args, sid, orahome, connectstring):
     """Get instance status"""
@@ -149,7 +152,10 @@ def get_orahome(args, sid):
                 logging.error(Errors.E016)
 
 def try_connect(args, sid, connectstring=None):
-    """Try to connect to the instance using all oracle_home candidates and methods"""
+    """
+    Try to connect to the instance using all oracle_home candidates and methods, one after another
+    until one works (instances are probed concurrently by the caller)
+    """
     orahomes = []
     for orahome in get_orahome(args, sid):
         # Check if orahome is used before on this instance
@@ -182,8 +188,109 @@ def try_connect(args, sid, connectstring=None):
 
     raise SQLConnectionError(Errors.E027 % sid)
 
+def read_proc(pid, name):
+    """Return the contents of /proc/<pid>/<name> or None if not readable"""
+    try:
+        with open(os.path.join('/proc', pid, name), 'rb') as f:
+            return f.read().decode('utf-8', 'replace')
+
+    except (IOError, OSError):
+        return None
+
+def proc_orahome(pid):
+    """
+    Get the ORACLE_HOME of a running Oracle background process.
+    The executable link is $ORACLE_HOME/bin/oracle, the environment is used if
+    the link cannot be read. Both are only readable by the owner and root.
+    """
+    try:
+        exe = os.readlink(os.path.join('/proc', pid, 'exe'))
+        # Relinked binaries show up as "/path/bin/oracle (deleted)"
+        exe = re.sub(r' \(deleted\)$', '', exe)
+        if os.path.basename(exe) == 'oracle':
+            return os.path.dirname(os.path.dirname(exe))
+
+    except OSError:
+        pass
+
+    environ = read_proc(pid, 'environ')
+    if environ:
+        for var in environ.split('\0'):
+            if var.startswith('ORACLE_HOME='):
+                return var.split('=', 1)[1].rstrip('/')
+
+    return None
+
+def name_or_id(func, num):
+    """User or group name for uid/gid num (func is getuser or getgroup), the number if there is no such name"""
+    try:
+        return func(num)
+
+    except KeyError:
+        return str(num)
+
+def get_pmon_procs():
+    """
+    Get the running pmon processes from procfs (Linux only), without running ps or SQL*Plus.
+    Returns a list of dicts (sorted by sid) with pid, sid, user, group, groups and oracle_home
+    (None if the home cannot be read).
+    """
+    procs = []
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+
+        cmdline = read_proc(pid, 'cmdline')
+        if not cmdline:
+            continue
+
+        r = re.match(r'ora_pmon_(\S+)', cmdline.replace('\0', ' '))
+        if not r:
+            continue
+
+        status = read_proc(pid, 'status')
+        if not status:
+            continue
+
+        try:
+            uid    = int(re.search(r'^Uid:\s+(\d+)', status, re.M).group(1))
+            gid    = int(re.search(r'^Gid:\s+(\d+)', status, re.M).group(1))
+            groups = [int(g) for g in re.search(r'^Groups:(.*)', status, re.M).group(1).split()]
+
+        except (AttributeError, ValueError):
+            logging.warning('Cannot parse owner of pmon process %s (%s)', pid, r.group(1))
+            continue
+
+        # Unknown users or groups (no passwd/group entry) are reported by id
+        user   = name_or_id(getuser, uid)
+        group  = name_or_id(getgroup, gid)
+        groups = [name_or_id(getgroup, g) for g in groups]
+
+        procs.append({
+            'pid': pid,
+            'sid': r.group(1),
+            'user': user,
+            'group': group,
+            'groups': groups,
+            'oracle_home': proc_orahome(pid),
+        })
+
+    return sorted(procs, key=lambda p: p['sid'])
+
+def get_pmon_ps():
+    """Get the running pmon processes using ps (if procfs is not available)"""
+    procs  = []
+    ps_out = execute('ps -eo pid,user,group,args')
+    for pid, user, group, sid in re.findall(r'(\d+)\s+(\w+)\s+(\w+)\s+ora_pmon_(.*)', ps_out.stdout):
+        procs.append({ 'pid': pid, 'sid': sid, 'user': user, 'group': group, 'groups': [], 'oracle_home': None })
+
+    return procs
+
 def get_instances(args):
-    """Gets all running sids with a valid ORACLE_HOME, return (sid, oracle_home) pairs"""
+    """
+    Gets all running sids with a valid ORACLE_HOME, yields (sid, oracle_home, connectstring) tuples.
+    Instances are yielded in order of detection as soon as they are available.
+    """
     instances = []
     excluded  = args.exclude.split(',') if args.exclude else []
     included  = args.include.split(',') if args.include else []
@@ -198,21 +305,34 @@ def get_instances(args):
         # Connect to services listed in the connect file
         logging.warning(Errors.W015)
         connects = load_file(args.logons)
+        logons   = []
         for connectstring in re.findall(r'^(\w+\/\S+@\S+/\S+)', connects, re.M):
             r = re.match(r'^\w+\/\S+@\S+/(\S+)', connectstring)
             if not r:
                 raise CustomException(Errors.E043 % args.logons)
 
-            sid = r.group(1)
-            orahome = try_connect(args, sid, connectstring)
-            instances.append((sid, orahome, connectstring))
+            logons.append((r.group(1), connectstring))
+
+        def connect_logon(logon):
+            sid, connectstring = logon
+            return (sid, try_connect(args, sid, connectstring), connectstring)
+
+        for instance in parallel(connect_logon, logons, DETECT_TASKS):
+            instances.append(instance)
+            yield instance
 
     else:
         # get all sids and try to connect
         logging.info('Detecting running Oracle instances')
-        ps_out = execute('ps -eo pid,user,group,args')
-        for pid, user, group, sid in re.findall(r'(\d+)\s+(\w+)\s+(\w+)\s+ora_pmon_(.*)', ps_out.stdout):
-            logging.info('Detected running instance %s, pid=%s, user=%s, group=%s', sid, pid, user, group)
+        if platform.system() == 'Linux' and os.path.isdir('/proc/self'):
+            procs = get_pmon_procs()
+        else:
+            procs = get_pmon_ps()
+
+        selected = []
+        for proc in procs:
+            sid = proc['sid']
+            logging.info('Detected running instance %s, pid=%s, user=%s, group=%s', sid, proc['pid'], proc['user'], proc['group'])
             if sid in excluded:
                 logging.warning(Errors.W013, sid)
                 continue
@@ -221,10 +341,25 @@ def get_instances(args):
                 logging.warning(Errors.W014, sid)
                 continue
 
-            orahome = try_connect(args, sid)
-            instances.append((sid, orahome, None))
+            selected.append(proc)
+
+        def connect_proc(proc):
+            sid = proc['sid']
+            # Use the ORACLE_HOME of the running pmon process unless --orahome is given.
+            # Trial connections are only needed if the home cannot be read from procfs
+            orahome = proc['oracle_home']
+            if orahome and not args.orahome and check_orahome(orahome):
+                logging.info('%s: ORACLE_HOME is %s (pmon pid %s, groups=%s)', sid, orahome, proc['pid'], ','.join(proc['groups']))
+                check_dba_group(sid, orahome)
+            else:
+                orahome = try_connect(args, sid)
+
+            return (sid, orahome, None)
+
+        # Probe all instances concurrently, results are in order of detection
+        for instance in parallel(connect_proc, selected, DETECT_TASKS):
+            instances.append(instance)
+            yield instance
 
         instlist = [x[0] for x in instances]
         logging.info('Instances detected: %s', ', '.join(instlist))
-
-    return instances
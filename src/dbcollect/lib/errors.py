@@ -62,6 +62,7 @@ class Errors():
     W016 = "[DBC-W016] %s: (%s) SQL*Plus Error %s, %s"
     W017 = "[DBC-W017] %s: Oracle not available (ORA-01034), skipping %s"
     W018 = "[DBC-W018] %s: OSDBA group %s from config.c not found"
+    W019 = "[DBC-W019] %s: AWR export of %s failed (%s)"
 
     E001 = "[DBC-E001] Unknown error: %s, see logfile for debug info"
     E002 = "[DBC-E002] Keyboard interrupt, Aborting..."
@@ -111,6 +112,11 @@ class Errors():
     E046 = "[DBC-E046] Timeout on receiving root tasks (Queue Empty)"
     E047 = "[DBC-E047] Timeout on waiting for collector, cannot send root tasks"
     E048 = "[DBC-E048] No such user: %s"
+    E049 = "[DBC-E049] Instance discovery failed, rc=%s"
+    E050 = "[DBC-E050] Not a dbcollect archive: %s"
+    E051 = "[DBC-E051] Compression %s not supported by this Python version"
+    E052 = "[DBC-E052] Output file is the input archive: %s"
+    E053 = "[DBC-E053] Cannot create spool directory in %s (%s)"
 
 class ErrorHelp():
     @classmethod
@@ -164,6 +170,9 @@ class ErrorHelp():
     W018 =  "The OSDBA group name from ORACLE_HOME/rdbms/lib/config.c does not exist on this host.\n\n" \
             "This often indicates the wrong ORACLE_HOME is being tried. DBCollect will continue with the next candidate.\n\n" \
             "Solution:\n\nVerify oratab, inventory, or use --orahome to specify the correct ORACLE_HOME."
+    W019 =  "The query for one of the views in the AWR export (--awr-export) returned an Oracle error, usually because the view does not exist in this database version or edition.\n\n" \
+            "The other views are exported. The error is kept in the export file of the view in the ZIP file.\n\n" \
+            "Solution:\n\nNone needed if the view is not available. Otherwise, send the logfile."
 
     E001 =  "This indicates an unexpected error in DBCollect due to a bug.\nSolution: Unknown, submit the logfile for debugging."
     E002 =  "DBCollect has been aborted, usually due to CTRL-C (cancel) keyboard sequence.\nSolution: restart dbcollect with the correct parameters."
@@ -267,6 +276,16 @@ class ErrorHelp():
             "dbsnmp/secret1234@//example.com/orcl\n\n"
     E044 =  "The listed command is not found in $PATH (/usr/sbin:/usr/bin:/bin:/sbin).\n\n"
     E045 =  "The process that runs tasks as root could not send the task results to the receiver. This should not happen and indicates a bug or other problem"
-    E046 =  "No more task results could be received but the sender did not complete successfully. Can be a side effect of a long running (root) process."
+    E046 =  "No more task results or keepalive notices were received from the root worker but it did not complete successfully. Check the logfile for errors in the root worker."
     E047 =  "Some subprocess took a long time causing the collector to timeout. Check the logfile."
     E048 =  "When called by root, dbcollect tried to switch to a non-existing user (specified by --user option). Try a different user."
+    E049 =  "The subprocess that detects Oracle instances and prepares their workload reports failed with the given returncode.\n\nSolution:\n\n" \
+            "This is a bug. Please submit the logfile for debugging."
+    E050 =  "The file given with --rewrite is not a valid ZIP file or was not created by dbcollect (the ZIP comment has no dbcollect magic string).\n\n" \
+            "Solution:\n\nUse the original, unmodified dbcollect ZIP file."
+    E051 =  "The compression given with --compression is not available in the zipfile module of this Python version (bzip2 and lzma require Python 3).\n\n" \
+            "Solution:\n\nUse a different compression or run dbcollect with Python 3."
+    E052 =  "The output file for --rewrite (--filename) is the same file as the archive to rewrite. The input archive is read while the output is written.\n\n" \
+            "Solution:\n\nUse a different --filename or leave it out (the output is then written to <zip>-rewrite.zip)."
+    E053 =  "dbcollect could not create its spool directory (for the results of the root tasks) in the temp directory.\n\n" \
+            "Solution:\n\nCheck that the directory given with --tempdir (default /tmp) exists and is writable, or use a different --tempdir."
@@ -6,6 +6,7 @@ License: GPLv3+
 
 import sys, os, platform, logging, time, pwd
 from datetime import datetime
+from threading import Lock
 
 try:
     from lib.buildinfo import buildinfo
@@ -23,6 +24,43 @@ def get_timestamp(ts):
     """Workaround for strftime() not working (HP-UX)"""
     return '{0:04}-{1:02}-{2:02} {3:02}:{4:02}'.format(ts.year, ts.month, ts.day, ts.hour, ts.minute)
 
+# Process-wide cache for the host identity and header timestamps of JSONPlus objects
+# (JSONPlus objects are also created in threads, the lock protects the host identity while it is filled)
+_hostidentity = {}
+_timestamps   = {}
+_identitylock = Lock()
+
+def host_identity():
+    """
+    Return the host identity fields for JSONPlus headers. These are computed once per process
+    (platform.processor() may fork "uname -p"). The username is cached per uid as it
+    changes when dropping root privileges.
+    """
+    with _identitylock:
+        if not _hostidentity:
+            _hostidentity['hostname']  = platform.uname()[1]  # Hostname
+            _hostidentity['machine']   = platform.machine()   # x86_64 | sun4v | 00F6035A4C00 (AIX) | AMD64 etc...
+            _hostidentity['system']    = platform.system()    # Linux  | SunOS | SunOS | AIX | Windows
+            _hostidentity['processor'] = platform.processor() # x86_64 | i386 | sparc | powerpc | Intel64 Family ...
+
+        uid = os.getuid()
+        if _hostidentity.get('uid') != uid:
+            _hostidentity['user'] = pwd.getpwuid(uid).pw_name
+            _hostidentity['uid']  = uid
+
+        return dict(_hostidentity)
+
+def get_timestamps():
+    """Return the (local, utc) timestamps. The timestamps have minute resolution so they are only formatted once per minute"""
+    now    = time.time()
+    minute = int(now // 60)
+    cached = _timestamps.get('now')
+    if cached is None or cached[0] != minute:
+        cached = (minute, get_timestamp(datetime.fromtimestamp(now)), get_timestamp(datetime.utcfromtimestamp(now)))
+        _timestamps['now'] = cached
+
+    return cached[1], cached[2]
+
 class FileInfo():
     def __init__(self, path):
         self.path = path
@@ -79,15 +117,15 @@ class JSONPlus():
     JSONPlus file format is simply a JSON with the data of a command or file appended
     """
     def __init__(self):
+        identity = host_identity()
         self.info = {}
         self.info['application']  = 'dbcollect'
         self.info['version']      = versioninfo['version']
-        self.info['hostname']     = platform.uname()[1]  # Hostname
-        self.info['machine']      = platform.machine()   # x86_64 | sun4v | 00F6035A4C00 (AIX) | AMD64 etc...
-        self.info['system']       = platform.system()    # Linux  | SunOS | SunOS | AIX | Windows
-        self.info['processor']    = platform.processor() # x86_64 | i386 | sparc | powerpc | Intel64 Family ...
-        self.info['timestamp']    = get_timestamp(datetime.now())
-        self.info['timestamputc'] = get_timestamp(datetime.utcnow())
+        self.info['hostname']     = identity['hostname']
+        self.info['machine']      = identity['machine']
+        self.info['system']       = identity['system']
+        self.info['processor']    = identity['processor']
+        self.info['timestamp'], self.info['timestamputc'] = get_timestamps()
         self.info['status']       = None
         self.name   = None
         self.errors = None
@@ -133,7 +171,7 @@ class JSONPlusMeta(JSONPlus):
 class JSONPlusCommand(JSONPlus):
     def __init__(self, args, cmd, progress=None, **kwargs):
         JSONPlus.__init__(self)
-        user = pwd.getpwuid(os.getuid()).pw_name
+        user = host_identity()['user']
         self.info['mediatype']  = 'command'
         self.info['format']     = 'text'
         self.info['command']    = cmd
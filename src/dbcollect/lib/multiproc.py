@@ -4,9 +4,11 @@ Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
 License: GPLv3+
 """
 
-import os, tempfile
+import sys, os, tempfile
 from shutil import rmtree
+from threading import BoundedSemaphore
 from multiprocessing import Event, Queue
+from multiprocessing.pool import ThreadPool
 
 class Tempdir():
     """Temp directory class with subdirs, which cleans up the tempdir when it gets deleted"""
@@ -26,3 +28,69 @@ class Shared():
         self.tempdir   = tempdir
         self.jobs      = Queue(60)
         self.done      = Event()
+
+def parallel(func, items, workers):
+    """
+    Generator that runs func(item) for each item in a bounded pool of threads.
+    Results are returned in the order of items (exceptions are raised in that order too),
+    so the outcome is the same as when running them one after another.
+    Runs serially on Python 2, as subprocess is not thread-safe there.
+    """
+    items = list(items)
+    if workers < 2 or len(items) < 2 or sys.version_info[0] == 2:
+        for item in items:
+            yield func(item)
+        return
+
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        for result in pool.imap(func, items):
+            yield result
+
+    finally:
+        pool.close()
+        pool.join()
+
+def basecmd(cmd):
+    """Base command name without path: '/usr/sbin/pvdisplay -v' -> 'pvdisplay'"""
+    return os.path.basename(cmd.split()[0])
+
+def run_commands(func, commands, workers, hints=None):
+    """
+    Generator that runs func(tag, cmd) for each (tag, cmd) in commands in a bounded pool of threads
+    and yields (tag, result) in the order of commands.
+    hints has the cost (expensive commands are started first) and concurrency limit per base command.
+    Runs serially on Python 2, as subprocess is not thread-safe there.
+    """
+    commands = list(commands)
+    hints    = hints or {}
+    if workers < 2 or len(commands) < 2 or sys.version_info[0] == 2:
+        for tag, cmd in commands:
+            yield tag, func(tag, cmd)
+        return
+
+    slots = {}
+    for name, hint in hints.items():
+        if 'limit' in hint:
+            slots[name] = BoundedSemaphore(hint['limit'])
+
+    def run(tag, cmd):
+        slot = slots.get(basecmd(cmd))
+        if slot is None:
+            return func(tag, cmd)
+        with slot:
+            return func(tag, cmd)
+
+    # Stable sort, so commands with the same cost start in table order
+    order   = sorted(range(len(commands)), key=lambda i: -hints.get(basecmd(commands[i][1]), {}).get('cost', 1))
+    results = [None] * len(commands)
+    pool    = ThreadPool(min(workers, len(commands)))
+    try:
+        for i in order:
+            results[i] = pool.apply_async(run, commands[i])
+        for i, result in enumerate(results):
+            yield commands[i][0], result.get()
+
+    finally:
+        pool.close()
+        pool.join()
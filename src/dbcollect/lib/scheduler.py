@@ -0,0 +1,108 @@
+"""
+scheduler.py - Run collection phases concurrently
+Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
+License: GPLv3+
+
+Each task runs in its own thread, except tasks that fork processes (multiprocessing), which run
+one after another on the main thread while the other tasks run. The phases do not depend on
+each other's output, so there is no ordering between tasks.
+Resource classes (i.e. cpu, db, disk) limit how many tasks using the resource run at the same time.
+On Python < 3.7, tasks run one after another in the order they were added, as forking
+while other threads run (for the Oracle workers) can deadlock on logging locks in older versions.
+"""
+
+import sys, logging
+from threading import Thread, Condition, BoundedSemaphore
+from multiprocessing import cpu_count
+
+class Task():
+    """A collection phase: func(*args), on the main thread if main is set"""
+    def __init__(self, name, func, args=(), resources=(), main=False):
+        self.name      = name
+        self.func      = func
+        self.args      = args
+        self.resources = sorted(resources) # Fixed order of acquiring, prevents deadlocks
+        self.main      = main
+
+class Scheduler():
+    """
+    Tasks that run concurrently. resources has the max number of concurrent tasks
+    for each resource class (0 is the number of CPUs)
+    """
+    def __init__(self, resources):
+        self.tasks   = []
+        self.slots   = {}
+        self.running = set()
+        self.errors  = []
+        self.cond    = Condition()
+        for name, limit in resources.items():
+            self.slots[name] = BoundedSemaphore(limit or cpu_count())
+
+    @property
+    def concurrent(self):
+        return sys.version_info >= (3, 7)
+
+    def add(self, name, func, args=(), resources=(), main=False):
+        """Add a task, using the given resource classes. Tasks that fork processes must set main"""
+        if name in [task.name for task in self.tasks]:
+            raise ValueError('Duplicate task {0}'.format(name))
+        for resource in resources:
+            if resource not in self.slots:
+                raise ValueError('Task {0} uses unknown resource {1}'.format(name, resource))
+
+        self.tasks.append(Task(name, func, args, resources, main))
+
+    def execute(self, task):
+        """Run a task within its resource slots, record exceptions for run()"""
+        for resource in task.resources:
+            self.slots[resource].acquire()
+        try:
+            if self.errors:
+                logging.debug('Task %s skipped after a failure', task.name)
+                return
+            logging.debug('Task %s started', task.name)
+            task.func(*task.args)
+            logging.debug('Task %s finished', task.name)
+
+        except BaseException: # pylint: disable=broad-exception-caught
+            self.errors.append(sys.exc_info())
+
+        finally:
+            for resource in reversed(task.resources):
+                self.slots[resource].release()
+            with self.cond:
+                self.running.discard(task.name)
+                self.cond.notify_all()
+
+    def run(self):
+        """
+        Run all tasks and wait for completion. After a failure, tasks waiting for a resource are skipped,
+        the first exception is raised again when the running tasks are finished.
+        Tasks on the main thread run after the other tasks are started.
+        """
+        if not self.concurrent:
+            for task in self.tasks:
+                logging.debug('Task %s started', task.name)
+                task.func(*task.args)
+            return
+
+        with self.cond:
+            for task in self.tasks:
+                self.running.add(task.name)
+                if task.main:
+                    continue
+                thread = Thread(target=self.execute, args=(task,), name=task.name)
+                thread.daemon = True
+                thread.start()
+
+        for task in self.tasks:
+            if task.main:
+                self.execute(task)
+
+        with self.cond:
+            while self.running:
+                # Timeout so the main thread can receive KeyboardInterrupt
+                self.cond.wait(1)
+
+        if self.errors:
+            raise self.errors[0][1]
@@ -55,7 +55,7 @@ def check_zipapp():
     """Checks access to the dbcollect zipapp package"""
     # Try to read a file from the package
     try:
-        get_pkg_resource('lib', 'config.py')
+        get_pkg_resource('lib', 'config.py', cached=False)
 
     except (OSError,IOError):
         ziploc = os.path.realpath(sys.path[0])
@@ -102,12 +102,18 @@ def usergroups():
     user = pwd.getpwuid(os.getuid()).pw_name
     return [g.gr_name for g in grp.getgrall() if user in g.gr_mem]
 
+# Cached uid and gid name lookups
+_users  = {}
+_groups = {}
+
 def getuser(uid):
     """Return the username for a given uid"""
-    uinfo = pwd.getpwuid(uid)
-    return uinfo.pw_name
+    if uid not in _users:
+        _users[uid] = pwd.getpwuid(uid).pw_name
+    return _users[uid]
 
 def getgroup(gid):
     """Return the groupname for a given gid"""
-    ginfo = grp.getgrgid(gid)
-    return ginfo.gr_name
+    if gid not in _groups:
+        _groups[gid] = grp.getgrgid(gid).gr_name
+    return _groups[gid]
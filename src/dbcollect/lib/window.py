@@ -0,0 +1,51 @@
+"""
+window.py - Collection period for OS performance data
+Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
+License: GPLv3+
+
+The period has the same calendar days as the AWR selection in getawrs.sql: from midnight
+(days - 1) days ago up to midnight (end_days - 1) days ago, so the defaults (10, 0) select
+the last 10 days including today. getawrs.sql counts from the last AWR snapshot,
+here the current date is used.
+"""
+
+import time
+from datetime import date, datetime, timedelta
+
+def timestamp(t):
+    """Epoch seconds as local time (same format as sarinfo/nmoninfo mtime)"""
+    if t is None:
+        return None
+    return datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M")
+
+def daystart(t):
+    """Midnight (local time) of the day of epoch seconds t"""
+    return time.mktime(date.fromtimestamp(t).timetuple())
+
+class Window():
+    """Collection period [begin, end) in epoch seconds"""
+    def __init__(self, days, end_days):
+        tomorrow   = date.today() + timedelta(days=1)
+        self.begin = time.mktime((tomorrow - timedelta(days=days)).timetuple())
+        self.end   = time.mktime((tomorrow - timedelta(days=end_days)).timetuple())
+
+    def outside(self, first, last):
+        """
+        Check a file with samples from first up to last (None if unknown)
+        Returns the reason if the file has no samples in the period, else None
+        """
+        if last is not None and last < self.begin:
+            return 'last sample before {0}'.format(timestamp(self.begin))
+        if first is not None and first >= self.end:
+            return 'first sample after {0}'.format(timestamp(self.end))
+        return None
+
+    @property
+    def dict(self):
+        return { 'begin': timestamp(self.begin), 'end': timestamp(self.end) }
+
+def perf_window(args):
+    """Collection period for OS performance files (--sar-days and --sar-end-days, default same as AWR)"""
+    days     = args.days if args.sar_days is None else args.sar_days
+    end_days = args.end_days if args.sar_end_days is None else args.sar_end_days
+    return Window(days, end_days)
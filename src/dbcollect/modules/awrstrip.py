@@ -11,81 +11,217 @@ Sections to be removed:
 * Top SQL tables (SQL Ordered by ...)
 * Complete list of SQL text
 * ADDM report
+
+The report is parsed incrementally (expat) and copied to the output as-is, except for the
+byte ranges of the removed elements, so memory usage does not depend on the report size.
+Text format AWR reports (--awr-format text, .txt) are stripped line by line: a section starts
+with its title in the first column and ends at the next section heading (title with DB/Inst and
+Snaps) or the end of the report. The line of dashes that closes a section can also occur in
+the SQL text, so it does not end the removal.
 """
 
-import sys, re, logging
+import os, re, logging
+from xml.parsers.expat import ParserCreate, ExpatError
+
 from lib.compat import strerror
 from lib.errors import Errors
 
-try:
-    from lxml import etree
-except ImportError:
-    from xml.etree import ElementTree as etree
+CHUNKSIZE = 65536
+REMOVED   = b'<h3>Section removed by awrstrip</h3>'
+SQL_TABLE = re.compile(r"top sql|sql statements", re.I)
+
+REMOVED_TEXT = b'\nSection removed by awrstrip\n\n'
+TEXT_START   = re.compile(br'^(SQL ordered by|Complete List of SQL Text|Top ADDM Findings|ADDM Report)')
+TEXT_HEADING = re.compile(br'^(\S.*\sDB(/Inst)?: .*\sSnaps: |End of Report)')
+
+class NullWriter():
+    """Output that is discarded (no output file)"""
+    def write(self, data):
+        pass
 
-try:
-    ParseError = etree.ParseError
-except AttributeError:
-    from xml.parsers.expat import ExpatError
-    ParseError = (ExpatError, SyntaxError)
+class AWRStripper():
+    """
+    Incremental stripper: feed() the report in chunks, the stripped report is written to out.
+    Input is copied up to the last '<' (a tag that may not be parsed yet) or the start of
+    a <pre> element that is not yet known to be the ADDM report.
+    """
+    def __init__(self, out):
+        self.out      = out
+        self.buffer   = b''
+        self.offset   = 0     # Input position of the start of the buffer
+        self.depth    = 0
+        self.removing = None  # (depth, start) of the element being removed
+        self.pending  = None  # (depth, start) of a <pre> element, removed if the text starts with ADDM
+        self.pretext  = ''
+        self.empty    = None  # Input position of the last start tag, if no events followed it
+        self.changed  = False
+
+        self.parser = ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler  = self.start
+        self.parser.EndElementHandler    = self.end
+        self.parser.CharacterDataHandler = self.chardata
+
+    def feed(self, data, final=False):
+        """Parse the next chunk and write what can no longer be removed. Raises ExpatError on invalid xml"""
+        self.buffer += data
+        self.parser.Parse(data, final)
+        if final:
+            self.copy(self.offset + len(self.buffer))
+        else:
+            self.copy(self.offset + max(0, self.buffer.rfind(b'<')))
+
+    def copy(self, limit):
+        """Copy (or skip, if removing) the input up to limit"""
+        if self.pending:
+            limit = min(limit, self.pending[1])
+        if limit <= self.offset:
+            return
+        if not self.removing:
+            self.out.write(self.buffer[:limit - self.offset])
+        self.buffer = self.buffer[limit - self.offset:]
+        self.offset = limit
+
+    def remove(self, depth, start):
+        """Start removing the element at input position start"""
+        self.copy(start)
+        self.out.write(REMOVED)
+        self.removing = (depth, start)
+        self.changed  = True
+
+    def decide(self):
+        """Remove the pending <pre> element if the text (before any child element) starts with ADDM"""
+        depth, start = self.pending
+        self.pending = None
+        if self.pretext.strip().startswith('ADDM'):
+            self.remove(depth, start)
+
+    def start(self, name, attrs):
+        index = self.parser.CurrentByteIndex
+        if self.pending:
+            self.decide()
+        self.depth += 1
+        self.empty  = index
+        if self.removing:
+            return
+        if name == 'table' and SQL_TABLE.search(attrs.get('summary', '')):
+            self.remove(self.depth, index)
+        elif name == 'pre':
+            self.pending = (self.depth, index)
+            self.pretext = ''
+
+    def end(self, name):
+        index = self.parser.CurrentByteIndex
+        if self.pending and self.pending[0] == self.depth:
+            self.decide()
+        if self.removing and self.removing[0] == self.depth:
+            # An empty element (<pre/>) ends at the index, else skip the end tag
+            pos = index - self.offset
+            if self.empty is None or self.buffer[pos - 2:pos] != b'/>':
+                pos = self.buffer.index(b'>', pos) + 1
+            self.buffer   = self.buffer[pos:]
+            self.offset  += pos
+            self.removing = None
+        self.empty  = None
+        self.depth -= 1
+
+    def chardata(self, data):
+        self.empty = None
+        if self.pending:
+            self.pretext += data
+            text = self.pretext.lstrip()
+            # Decide as soon as the start of the text is known
+            if len(text) >= 4 or not 'ADDM'.startswith(text):
+                self.decide()
+
+class TextStripper():
+    """Incremental stripper for text format AWR reports, with the same interface as AWRStripper"""
+    def __init__(self, out):
+        self.out      = out
+        self.partial  = b''
+        self.removing = False
+        self.changed  = False
+
+    def feed(self, data, final=False):
+        """Process the complete lines of the next chunk"""
+        data = self.partial + data
+        if final:
+            self.partial = b''
+        else:
+            end = data.rfind(b'\n') + 1
+            data, self.partial = data[:end], data[end:]
+
+        for line in data.splitlines(True):
+            if self.removing:
+                if not TEXT_HEADING.match(line):
+                    continue
+                self.removing = False
+            if TEXT_START.match(line):
+                # Keep the title, remove the section up to the next heading
+                self.out.write(line + REMOVED_TEXT)
+                self.removing = True
+                self.changed  = True
+            else:
+                self.out.write(line)
+
+def is_awr_report(name):
+    """True for AWR reports that can be stripped (html or text format)"""
+    if name.endswith('.html'):
+        return True
+    return name.endswith('.txt') and '_awr_' in os.path.basename(name)
+
+def get_stripper(name, out):
+    """The stripper for the format of the report"""
+    if name.endswith('.html'):
+        return AWRStripper(out)
+    return TextStripper(out)
 
 def awrstrip(path, out=None, inplace=False):
-    """Strip a html formatted AWR report from sections containing SQL text.
+    """Strip a html (or text) formatted AWR report from sections containing SQL text.
     The ADDM report is also removed as it also often contains SQL code.
 
     Parameters:
-    path: file to be processed (must be valid html)
+    path: file to be processed (must be valid html, or .txt for text format)
     out: path to save file as (not saved if none)
     inplace: save to same file if True
 
     Returns:
     None
     """
-    _deleted = 'Section removed by awrstrip'
-
-    if 'lxml' not in sys.modules:
-        logging.debug('python-lxml package not found, fallback to slower xml package')
+    if inplace is True:
+        out = path
 
+    # Written to a temp file first, which replaces out if anything was removed
+    tmp = None
     try:
-        tree = etree.parse(path)
+        if out:
+            tmp    = '{0}.{1}.tmp'.format(out, os.getpid())
+            writer = open(tmp, 'wb')
+        else:
+            writer = NullWriter()
 
-    except ParseError:
+        try:
+            stripper = get_stripper(path, writer)
+            with open(path, 'rb') as f:
+                while True:
+                    data = f.read(CHUNKSIZE)
+                    stripper.feed(data, final=not data)
+                    if not data:
+                        break
+        finally:
+            if tmp:
+                writer.close()
+
+        if tmp and stripper.changed:
+            os.rename(tmp, out)
+            tmp = None
+
+    except ExpatError:
         logging.error(Errors.E006, path)
-        return
 
-    blacklist = []
-    try:
-        tree_iter = tree.iter
-
-    except AttributeError:
-        # Need this on Python 2.6
-        tree_iter = tree.getiterator
-
-    for element in tree_iter():
-        if element.tag == 'table':
-            # Look for tables with 'SQL' in the 'summary' attribute
-            summary = element.get('summary')
-            if summary:
-                if re.search(r"top sql|sql statements", summary, re.I):
-                    #logging.debug('removing table "%s"', summary.replace('\n',''))
-                    blacklist.append(element)
-        elif element.tag == 'pre':
-            # Look for a separate <pre> section starting with ADDM
-            if element.text and element.text.strip().startswith('ADDM'):
-                #logging.debug('removing section "ADDM Report"')
-                blacklist.append(element)
-
-    changed = False
-    for elem in blacklist:
-        changed = True
-        elem.clear()
-        elem.tag = 'h3'
-        elem.text = _deleted
+    except (IOError, OSError) as err:
+        logging.error(Errors.E007, err.filename or out, strerror(err.errno))
 
-    if inplace is True:
-        out = path
-
-    if out and changed:
-        try:
-            tree.write(out, encoding="utf-8")
-        except IOError as err:
-            logging.error(Errors.E007, out, strerror(err.errno))
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
@@ -4,26 +4,48 @@ Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
 License: GPLv3+
 """
 
-import os, sys, logging, platform, time
+import os, sys, pwd, shutil, logging, platform, time
+from tempfile import mkdtemp
 from multiprocessing import Process, Queue, Event
 
 from lib.compat import load_file, quiet, strerror, Empty
-from lib.config import WORKQUEUE_TIMEOUT, DBCOLLECT_LOG, versioninfo
+from lib.config import WORKQUEUE_TIMEOUT, DBCOLLECT_LOG, versioninfo, phase_resources
 from lib.log import logfile_handler
 from lib.errors import CustomException, Errors, DBCollectFailed, DBWorkerFailed
 from lib.user import drop_user, username, get_user
 from lib.jsonfile import JSONPlusMeta
 from lib.archive import Archive
+from lib.scheduler import Scheduler
 
-from modules.rootworker import root_worker
+from modules.rootworker import root_worker, KEEPALIVE
 from modules.oracle import oracle_info
-from modules.syscollect import host_info
+from modules.syscollect import host_tasks
 
 class Exchange():
-    """Container class for sharing between multiple processes"""
-    def __init__(self):
-        self.ready = Event()
-        self.queue = Queue(5)
+    """
+    Container class for sharing between multiple processes
+    The root worker writes its results in the spool directory and only sends small notices over the queue.
+    The spool directory stays owned by root and cannot be listed by others, each file is owned by
+    the dbcollect user and only readable by that user (see Spool.put)
+    """
+    def __init__(self, user, tempdir):
+        self.ready    = Event()
+        self.queue    = Queue()
+        pw            = pwd.getpwnam(user)
+        self.uid      = pw.pw_uid
+        self.gid      = pw.pw_gid
+        try:
+            self.spooldir = mkdtemp(prefix='dbcollect-', dir=tempdir)
+
+        except OSError as e:
+            raise CustomException(Errors.E053 % (tempdir, strerror(e.errno)))
+
+        if os.getuid() == 0:
+            os.chmod(self.spooldir, 0o711)
+
+    def cleanup(self):
+        """Remove the spool directory and its files"""
+        shutil.rmtree(self.spooldir, ignore_errors=True)
 
     def drain(self):
         # Empties the queue to prevent hanging on join()
@@ -37,18 +59,19 @@ def collect_wrapper(args):
     """
     Sets up the environment, then runs a root and a non-root worker.
 
-    The root worker sends the collected info over a queue to be stored in the
-    ZIP file owned by the non-root worker.
+    The root worker writes the collected info in a spool directory and sends notices
+    over a queue, so it can be stored in the ZIP file owned by the non-root worker.
 
     If dbcollect was not started as root, the root_worker will not send any data
     """
+    exchange = None
     try:
-        # create multiprocessing container
-        exchange = Exchange()
-
         # Get user to run worker with
         user = get_user(args)
 
+        # create multiprocessing container
+        exchange = Exchange(user, args.tempdir)
+
         # Setup logging
         try:
             logfile_handler(args, user, DBCOLLECT_LOG)
@@ -86,9 +109,13 @@ def collect_wrapper(args):
     except KeyboardInterrupt:
         logging.critical(Errors.E002)
 
+    finally:
+        if exchange:
+            exchange.cleanup()
+
 def get_root_tasks(archive, exchange):
     """
-    Pick up the task data from the root queue
+    Pick up the task results from the spool directory when notified by the root worker
     Note that this function runs as non-root user
     """
     # Signal the root worker to start sending
@@ -97,17 +124,23 @@ def get_root_tasks(archive, exchange):
     # Pick up task data until root worker is done
     while True:
         try:
-            # Timeout must be larger than the root_worker timeout
-            obj = exchange.queue.get(timeout=WORKQUEUE_TIMEOUT)
+            # Timeout must be larger than the root_worker keepalive interval
+            notice = exchange.queue.get(timeout=WORKQUEUE_TIMEOUT)
 
             # Keep processing until the root_worker sends None to signal completion
-            if obj is None:
+            if notice is None:
                 break
 
-            archive.writestr(obj.name, obj.jsonp())
+            if notice == KEEPALIVE:
+                continue
+
+            name, filename = notice
+            path = os.path.join(exchange.spooldir, filename)
+            # The file is removed by the cleanup (as root)
+            archive.store(path, name)
 
         except Empty:
-            # Break on timeout (usually caused by long-running root tasks or errors in root worker)
+            # Break on timeout (root worker stopped without completion)
             logging.error(Errors.E046)
             break
 
@@ -141,14 +174,19 @@ def dbcollect_worker(args, exchange, user):
             metainfo = JSONPlusMeta()
             archive.writestr('meta.json', metainfo.dump())
 
+            # OS, root and Oracle collection run concurrently, limited by resource class
+            scheduler = Scheduler(phase_resources)
+
             # Get the data from the root worker early to prevent timeouts
-            get_root_tasks(archive, exchange)
+            scheduler.add('root', get_root_tasks, (archive, exchange))
 
             if not args.no_sys:
-                host_info(archive, args)
+                host_tasks(scheduler, archive, args)
 
             if not args.no_ora:
-                oracle_info(archive, args)
+                scheduler.add('oracle', oracle_info, (archive, args), resources=('cpu', 'db'), main=True)
+
+            scheduler.run()
 
             # If there was no exception, ZIP file was created successfully
             logging.info('Zip file {0} is created succesfully.'.format(archive.path))
@@ -6,16 +6,20 @@ License: GPLv3+
 
 # pylint: disable=too-many-instance-attributes,too-many-positional-arguments,too-many-arguments
 
-import json, re, logging
+import os, json, re, math, logging
+from datetime import datetime
 
-from lib.compat import get_pkg_resource
+from lib.compat import get_pkg_resource, write_file
+from lib.config import awrexport_config
 from lib.errors import Errors, ReportingError, SQLPlusError
+from lib.jsonfile import JSONPlusDBInfo
 from lib.sqlplus import sqlplus
 
 class Job():
     """AWR/Statspack job definition"""
-    def __init__(self, reptype, sid, dbid, instnum, beginsnap, endsnap, begintime, endtime):
+    def __init__(self, reptype, sid, dbid, instnum, beginsnap, endsnap, begintime, endtime, fmt='html'):
         self.reptype   = reptype
+        self.fmt       = fmt
         self.sid       = sid
         self.dbid      = dbid
         self.instnum   = instnum
@@ -23,11 +27,30 @@ class Job():
         self.endsnap   = endsnap
         self.begintime = begintime
         self.endtime   = endtime
+        self.parts     = [self.key] # Snapshot intervals covered by the job (more than one if coalesced)
+
+    @property
+    def minutes(self):
+        """Length of the interval in minutes"""
+        begin = datetime.strptime(self.begintime, '%Y%m%d_%H%M')
+        end   = datetime.strptime(self.endtime, '%Y%m%d_%H%M')
+        return (end - begin).days * 1440 + (end - begin).seconds // 60
+
+    def extend(self, job):
+        """Extend the interval with the next (chained) job"""
+        self.endsnap = job.endsnap
+        self.endtime = job.endtime
+        self.parts  += job.parts
+
+    @property
+    def key(self):
+        """The snapshot interval of the job"""
+        return (self.dbid, self.instnum, self.beginsnap, self.endsnap)
 
     @property
     def filename(self):
         """Return the filename to be stored in the archive"""
-        ext = 'html' if self.reptype == 'awr' else 'txt'
+        ext = 'html' if self.reptype == 'awr' and self.fmt == 'html' else 'txt'
         return '{0}_{1}_{2}_{3}_{4}_{5}_{6}.{7}'.format(self.sid, self.dbid, self.instnum, self.reptype, self.beginsnap, self.endsnap, self.begintime, ext)
 
     @property
@@ -37,8 +60,99 @@ class Job():
             return 'set term off escape off\ndefine begin_snap={beginsnap}\ndefine end_snap={endsnap}\ndefine report_name={filename}\n@?/rdbms/admin/spreport'.format(
                 beginsnap=self.beginsnap, endsnap=self.endsnap, filename=self.filename)
 
-        return 'SELECT output FROM table (dbms_workload_repository.awr_report_html({dbid},{inst},{beginsnap},{endsnap}));\n'.format(
-            dbid=self.dbid, inst=self.instnum, beginsnap=self.beginsnap, endsnap=self.endsnap)
+        return 'SELECT output FROM table (dbms_workload_repository.awr_report_{fmt}({dbid},{inst},{beginsnap},{endsnap}));\n'.format(
+            fmt=self.fmt, dbid=self.dbid, inst=self.instnum, beginsnap=self.beginsnap, endsnap=self.endsnap)
+
+class ExportJob():
+    """AWR export job: the rows of one dba_hist view for a snapshot range, same interface as Job"""
+    reptype = 'export'
+
+    def __init__(self, sid, script, dbid, instnum, beginsnap, endsnap):
+        self.sid       = sid
+        self.view      = script.replace('.sql', '')
+        self.script    = script
+        self.dbid      = dbid
+        self.instnum   = instnum
+        self.beginsnap = beginsnap
+        self.endsnap   = endsnap
+
+    @property
+    def filename(self):
+        """Return the filename to be stored in the archive"""
+        return '{0}_{1}_{2}_export_{3}_{4}_{5}.txt'.format(self.sid, self.dbid, self.instnum, self.view, self.beginsnap, self.endsnap)
+
+    @property
+    def query(self):
+        """Return the SQLPlus query to export the view (SQL errors are spooled, the session is restored to exit on errors)"""
+        header = get_pkg_resource('sql', 'awrexport/header.sql')
+        define = 'define dbid = {0}\ndefine inst = {1}\ndefine begin_snap = {2}\ndefine end_snap = {3}\n'.format(
+            self.dbid, self.instnum, self.beginsnap, self.endsnap)
+        return header + define + get_pkg_resource('sql', 'awrexport/{0}'.format(self.script)) + '\nWHENEVER SQLERROR EXIT SQL.SQLCODE\n'
+
+def export_jobs(sid, jobs):
+    """
+    Replace the AWR jobs with export jobs for each view in awrexport_config,
+    covering the snapshot range of the AWR jobs per database and instance
+    """
+    ranges = {}
+    for job in jobs:
+        key = (job.dbid, job.instnum)
+        begin, end = ranges.get(key, (int(job.beginsnap), int(job.endsnap)))
+        ranges[key] = (min(begin, int(job.beginsnap)), max(end, int(job.endsnap)))
+
+    exports = []
+    for (dbid, instnum), (beginsnap, endsnap) in sorted(ranges.items()):
+        for script in awrexport_config:
+            exports.append(ExportJob(sid, script, dbid, instnum, beginsnap, endsnap))
+    return exports
+
+def coalesce_jobs(jobs, minutes):
+    """
+    Combine chained jobs (the begin snapshot is the end snapshot of the previous job) per database
+    and instance into jobs of at least the given minutes. getawrs.sql/getsps.sql do not return
+    intervals over a restart so a chain never spans a restart.
+    """
+    coalesced = []
+    last      = {}
+    for job in jobs:
+        prev = last.get((job.dbid, job.instnum))
+        if prev and prev.endsnap == job.beginsnap and prev.minutes < minutes:
+            prev.extend(job)
+            continue
+        last[(job.dbid, job.instnum)] = job
+        coalesced.append(job)
+
+    return coalesced
+
+def job_dbtime(job, dbtime):
+    """DB time and DB CPU of a job, summed over its snapshot intervals. None if not available"""
+    times = [dbtime[key] for key in job.parts if key in dbtime]
+    if not times:
+        return None
+    return (round(sum([t[0] for t in times]), 1), round(sum([t[1] for t in times]), 1))
+
+def peak_count(peak, intervals):
+    """Number of intervals to select for --peak: N, or P% of the intervals (rounded up)"""
+    if peak.endswith('%'):
+        return int(math.ceil(intervals * float(peak[:-1]) / 100))
+    return int(peak)
+
+def peak_jobs(jobs, dbtime, peak):
+    """
+    Select the jobs for the intervals with the highest DB time per minute per database and instance
+    (coalesced jobs differ in length). dbtime: {job.key: (dbtime, dbcpu)}, jobs without DB time are not selected
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job.dbid, job.instnum), []).append(job)
+
+    selected = set()
+    for group in groups.values():
+        ranked = sorted([job for job in group if job.key in dbtime], key=lambda job: -dbtime[job.key][0] / max(job.minutes, 1))
+        for job in ranked[:peak_count(peak, len(group))]:
+            selected.add(job.key)
+
+    return [job for job in jobs if job.key in selected]
 
 class Instance():
     """Oracle Instance with SQL*Plus, scripts and other methods"""
@@ -48,6 +162,7 @@ class Instance():
         self.orahome   = orahome
         self.connect   = connectstring
         self.jobs      = []
+        self.peaks     = None # DB time per interval for --peak, saved by the consumer
         self.scripts   = {}
         self.meta_txt  = self.script('meta')
         try:
@@ -136,9 +251,71 @@ class Instance():
             words = line.split(',')
             if not len(words) == 6:
                 continue
-            job = Job(reptype, self.sid, *words)
+            job = Job(reptype, self.sid, *words, fmt=args.awr_format)
             self.jobs.append(job)
 
+        if args.granularity:
+            intervals = len(self.jobs)
+            self.jobs = coalesce_jobs(self.jobs, args.granularity)
+            logging.info('{0}: Combined {1} intervals into {2} reports of at least {3} minutes'.format(self.sid, intervals, len(self.jobs), args.granularity))
+
+        if args.awr_export:
+            if reptype == 'awr':
+                self.jobs = export_jobs(self.sid, self.jobs)
+                ranges    = len(set([(job.dbid, job.instnum) for job in self.jobs]))
+                logging.info('{0}: AWR export requested, {1} export jobs for {2} snapshot ranges'.format(self.sid, len(self.jobs), ranges))
+            else:
+                logging.info('{0}: AWR export not available for Statspack, generating reports'.format(self.sid))
+
+        elif args.peak:
+            if reptype == 'awr':
+                self.jobs = self.peak_intervals(args, header)
+            else:
+                logging.info('{0}: Peak intervals not available for Statspack, generating all reports'.format(self.sid))
+
+    def peak_intervals(self, args, header):
+        """
+        Return the AWR jobs for the busiest intervals by DB time (--peak).
+        The DB time of all intervals is kept in self.peaks (see peaks_jsonp)
+        """
+        dbtime = {}
+        for line in self.script('getdbtime', header=header).splitlines():
+            words = line.split(',')
+            if not len(words) == 6:
+                continue
+            try:
+                dbtime[tuple(words[:4])] = (float(words[4]), float(words[5]))
+            except ValueError:
+                logging.debug('{0}: Ignoring DB time line: {1}'.format(self.sid, line))
+
+        # Coalesced jobs (--granularity) get the sum of their intervals
+        jobtime = {}
+        for job in self.jobs:
+            times = job_dbtime(job, dbtime)
+            if times:
+                jobtime[job.key] = times
+
+        selected = peak_jobs(self.jobs, jobtime, args.peak)
+        keys     = set([job.key for job in selected])
+        lines    = ['DBID|INST_NUM|BEGIN_SNAP|END_SNAP|BEGINTIME|ENDTIME|DBTIME|DBCPU|SELECTED']
+        for job in self.jobs:
+            times = jobtime.get(job.key, ('', ''))
+            lines.append('|'.join([str(x) for x in job.key + (job.begintime, job.endtime) + times + ('Y' if job.key in keys else 'N',)]))
+
+        self.peaks = '\n'.join(lines) + '\n'
+
+        logging.info('{0}: Peak intervals requested, {1} of {2} intervals selected'.format(self.sid, len(selected), len(self.jobs)))
+        return selected
+
+    def peaks_jsonp(self, args):
+        """
+        Return the DB time per interval (--peak) as dbinfo JSONPlus. Called by the consumer of
+        the discovered instances, the discovery process does not write in the dbinfo directory
+        """
+        path = os.path.join(self.tempdir, '{0}_awrpeaks.txt'.format(self.sid))
+        write_file(path, self.peaks)
+        return JSONPlusDBInfo(self, path, script='getdbtime.sql', peak=args.peak)
+
     @property
     def num_jobs(self):
         return len(self.jobs)
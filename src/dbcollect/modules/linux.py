@@ -6,15 +6,21 @@ License: GPLv3+
 
 # pylint: disable=unused-argument
 
-import os, re, stat, logging
+import os, stat, logging
 
-from lib.config import linux_config
+from lib.config import linux_config, command_hints, COMMAND_TASKS
 from lib.errors import Errors, CustomException
 from lib.user import getuser, getgroup
 from lib.jsonfile import JSONPlus, JSONPlusDirectories, JSONPlusCommand, JSONPlusFile
-from lib.compat import Progress, load_file, execute, listdir
-
-def get_disklist():
+from lib.compat import Progress, load_file, execute, listdir, listentries
+from lib.multiproc import run_commands
+from lib.window import perf_window, timestamp
+from modules.udev import UdevDB
+from modules.procfs import procfs_views
+from modules.multiview import multiview_commands
+from modules.sysstat import sa_header
+
+def get_disklist(udevdb):
     """Get configuration for all disks"""
     disklist = []
     lsblk = execute('lsblk -dno name')
@@ -32,58 +38,94 @@ def get_disklist():
             except IOError:
                 info[var] = None
 
-        cmd = 'udevadm info -q symlink -n {0}'.format(dev)
-        udevadm = execute(cmd)
-        if udevadm.returncode != 0:
-            info['udevadm_cmd'] = { 'command': cmd, 'stdout': udevadm.stdout, 'stderr': udevadm.stderr, 'rc': udevadm.returncode }
-
-        info['symlinks'] = udevadm.stdout.split()
-        cmd = 'udevadm info -q property -n {0}'.format(dev)
-        udevinfo = execute(cmd)
-        for k, v in re.findall(r'^(\S+)=(.*)', udevinfo.stdout, re.M):
-            info['properties'][k] = v
+        try:
+            major, minor = [int(x) for x in info['dev'].split(':')]
+        except (AttributeError, ValueError):
+            major, minor = None, None
 
+        info.update(udevdb.device(major, minor, dev))
         disklist.append(info)
 
     diskinfo = JSONPlus()
     diskinfo.set('diskinfo', {'disklist': disklist })
     return diskinfo
 
-def get_blockdevs():
-    """Get configuration for all logical block devices"""
-    blockinfo = {}
-    for root, _, files in os.walk('/dev'):
-        for file in sorted(files):
-            path = os.path.join(root, file)
+def scan_blockdevs(top='/dev'):
+    """
+    Walk the device tree once and return the block devices: a list of dicts with the stat info,
+    the path of the device node and all links (the node and its symlinks), in the order they are found.
+    There is one entry per device node, also if several nodes have the same device number (such as
+    ASMLib disks). Symlinks are assigned to the node by device number, realpath is only needed if
+    that is ambiguous or the node is outside the tree. The files in a directory are processed
+    before its subdirectories, directory symlinks are not followed.
+    """
+    found = []  # (path, devno, stat, is_symlink) in walk order
+    nodes = {}  # device nodes by (major, minor)
+    dirs  = [top]
+    while dirs:
+        directory = dirs.pop(0)
+        try:
+            entries = listentries(directory)
+        except OSError:
+            continue
+
+        subdirs = []
+        for _, path, is_dir, is_symlink in entries:
+            if is_dir:
+                subdirs.append(path)
+                continue
             try:
                 st = os.stat(path)
-                if not stat.S_ISBLK(st.st_mode):
-                    continue
-
-                dev = os.path.realpath(path)
-                name = os.path.basename(dev)
-
-                if name not in blockinfo:
-                    blockinfo[name] = {
-                        'major': os.major(st.st_rdev),
-                        'minor': os.minor(st.st_rdev),
-                        'mode': st.st_mode,
-                        'user': getuser(st.st_uid),
-                        'group': getgroup(st.st_gid),
-                        'path': dev,
-                        'links': [],
-                        'properties': {}
-                    }
-                    udevinfo = execute('udevadm info -q property -n {0}'.format(name))
-                    for k, v in re.findall(r'^(\S+)=(.*)', udevinfo.stdout, re.M):
-                        blockinfo[name]['properties'][k] = v
-
-                blockinfo[name]['links'].append(path)
-
             except OSError:
                 continue
 
-    blockdevs = [blockinfo[name] for name, _ in blockinfo.items()]
+            if not stat.S_ISBLK(st.st_mode):
+                continue
+
+            devno = (os.major(st.st_rdev), os.minor(st.st_rdev))
+            found.append((path, devno, st, is_symlink))
+            if not is_symlink:
+                nodes.setdefault(devno, []).append(path)
+
+        # Depth first, like os.walk
+        dirs = subdirs + dirs
+
+    blockdevs = {}
+    order     = []
+    for path, devno, st, is_symlink in found:
+        if not is_symlink:
+            node = path
+        elif len(nodes.get(devno, [])) == 1:
+            node = nodes[devno][0]
+        else:
+            node = os.path.realpath(path)
+
+        if node not in blockdevs:
+            blockdevs[node] = { 'stat': st, 'node': node, 'links': [] }
+            order.append(node)
+        blockdevs[node]['links'].append(path)
+
+    return [blockdevs[node] for node in order]
+
+def get_blockdevs(udevdb):
+    """Get configuration for all logical block devices"""
+    blockdevs = []
+    for blockdev in scan_blockdevs('/dev'):
+        st    = blockdev['stat']
+        dev   = blockdev['node']
+        name  = os.path.basename(dev)
+        major = os.major(st.st_rdev)
+        minor = os.minor(st.st_rdev)
+        blockdevs.append({
+            'major': major,
+            'minor': minor,
+            'mode': st.st_mode,
+            'user': getuser(st.st_uid),
+            'group': getgroup(st.st_gid),
+            'path': dev,
+            'links': blockdev['links'],
+            'properties': udevdb.device(major, minor, name)['properties']
+        })
 
     blkinfo = JSONPlus()
     blkinfo.set('blockinfo', {'blockdevices': blockdevs} )
@@ -118,6 +160,67 @@ def get_niclist():
     nicinfo.set('nicinfo', {'niclist': niclist} )
     return nicinfo
 
+def get_dmlist():
+    """
+    Get the device-mapper topology (multipath, LVM, crypt maps) from sysfs.
+    For multipath maps, the paths are listed with their SCSI device state.
+    """
+    dmlist = []
+    for dev in listdir('/sys/block'):
+        if not dev.startswith('dm-'):
+            continue
+
+        directory = os.path.join('/sys/block', dev)
+        info = { 'name': dev }
+        for file in ['dev', 'size', 'dm/name', 'dm/uuid', 'dm/suspended']:
+            var = 'dm' + file.rpartition('/')[-1] if file.startswith('dm/') else file
+            try:
+                data = load_file(os.path.join(directory, file)).strip()
+                if var in ('size', 'dmsuspended'):
+                    data = int(data)
+                info[var] = data
+
+            except (IOError, ValueError):
+                info[var] = None
+
+        # The uuid prefix is the subsystem that created the map (mpath, LVM, CRYPT, part1)
+        info['target']  = info['dmuuid'].partition('-')[0] if info['dmuuid'] else None
+        info['slaves']  = sorted(listdir(os.path.join(directory, 'slaves')))
+        info['holders'] = sorted(listdir(os.path.join(directory, 'holders')))
+        if info['target'] == 'mpath':
+            info['paths'] = []
+            for slave in info['slaves']:
+                path = { 'name': slave }
+                for file in ['dev', 'device/state']:
+                    try:
+                        path[file.rpartition('/')[-1]] = load_file(os.path.join('/sys/block', slave, file)).strip()
+                    except IOError:
+                        path[file.rpartition('/')[-1]] = None
+                info['paths'].append(path)
+
+        dmlist.append(info)
+
+    dminfo = JSONPlus()
+    dminfo.set('dminfo', {'dmlist': sorted(dmlist, key=lambda dm: int(dm['name'][3:]))})
+    return dminfo
+
+def multipath_maps():
+    """
+    Return the number of device-mapper multipath maps, or None if sysfs is not available
+    """
+    if not os.path.isdir('/sys/block'):
+        return None
+
+    maps = 0
+    for dev in listdir('/sys/block'):
+        if dev.startswith('dm-'):
+            try:
+                if load_file(os.path.join('/sys/block', dev, 'dm/uuid')).startswith('mpath-'):
+                    maps += 1
+            except IOError:
+                continue
+    return maps
+
 def get_linux_config(archive):
     """Get Linux system configuration"""
     info = {}
@@ -156,17 +259,21 @@ def get_linux_config(archive):
     hostinfo.set('hostinfo', info)
     archive.writestr('hostinfo.json', hostinfo.dump())
 
-    diskinfo = get_disklist()
+    udevdb   = UdevDB()
+    diskinfo = get_disklist(udevdb)
     archive.writestr('diskinfo.json', diskinfo.dump())
 
     nicinfo = get_niclist()
     archive.writestr('nicinfo.json', nicinfo.dump())
 
-    blkinfo = get_blockdevs()
+    blkinfo = get_blockdevs(udevdb)
     archive.writestr('blockinfo.json', blkinfo.dump())
 
+    dminfo = get_dmlist()
+    archive.writestr('dminfo.json', dminfo.dump())
+
 def get_linux_sar(args, archive):
-    """Get all (binary) SAR files"""
+    """Get the (binary) SAR files with samples in the collection period"""
     if args.no_sar:
         return
 
@@ -174,6 +281,8 @@ def get_linux_sar(args, archive):
 
     sar_directories = ('/var/log/sa', '/var/log/sysstat')
     sarinfo  = JSONPlusDirectories(*sar_directories)
+    window   = perf_window(args)
+    skipped  = []
 
     try:
         sarversion = execute('sar -V')
@@ -182,21 +291,63 @@ def get_linux_sar(args, archive):
     except OSError:
         logging.warning(Errors.W008)
 
-    archive.writestr('sarinfo.json', sarinfo.dump())
-
     if os.path.isfile('/usr/bin/systemctl'):
         collect_timer = execute('systemctl is-active --quiet sysstat-collect.timer')
         if collect_timer.returncode != 0:
             logging.warning(Errors.W009)
 
-    for sardir in ('/var/log/sa', '/var/log/sysstat'):
+    for sardir in sar_directories:
         for sarfile in listdir(sardir):
             path = os.path.join(sardir, sarfile)
             if sarfile.startswith('sa'):
                 if sarfile.startswith('sar'):
                     continue
+                try:
+                    header = sa_header(path)
+
+                except (IOError, OSError, ValueError) as e:
+                    # Not a (known) sysstat file, store it anyway
+                    logging.debug('%s: cannot read sysstat header (%s)', path, e)
+                    archive.store(path)
+                    continue
+
+                reason = window.outside(header['first'], header['last'])
+                if reason:
+                    logging.debug('Skipping %s: %s', path, reason)
+                    skipped.append({ 'path': path, 'reason': reason, 'version': header['version'],
+                                     'first': timestamp(header['first']), 'last': timestamp(header['last']) })
+                    continue
+
                 archive.store(path)
 
+    sarinfo.set('window', window.dict)
+    sarinfo.set('skipped', skipped)
+    archive.writestr('sarinfo.json', sarinfo.dump())
+
+def procfs_command(args, cmd, render, progress):
+    """
+    Get the output of cmd from the procfs renderer instead of running it.
+    Runs the command if the renderer fails or the command is skipped (JSONPlusCommand handles skip_cmd)
+    """
+    if args.skip_cmd and cmd.split()[0] in args.skip_cmd.split(','):
+        return JSONPlusCommand(args, cmd=cmd)
+
+    try:
+        progress.message('reading procfs: {0}'.format(cmd))
+        data = render()
+
+    except (IOError, OSError) as e:
+        logging.debug('procfs: %s: %s, running command', cmd, e)
+        return JSONPlusCommand(args, cmd=cmd, progress=progress)
+
+    df = JSONPlusCommand(args, cmd=None)
+    df.set('command', cmd)
+    df.set('source', 'procfs')
+    df.set('status', 'OK')
+    df.set('returncode', 0)
+    df.data = data
+    return df
+
 def get_linux_commands(args, archive):
     """Run the non-root commands for the OS specified in the config"""
 
@@ -208,14 +359,29 @@ def get_linux_commands(args, archive):
 
     progress = Progress(args)
 
+    # ps, sysctl and lsmod listings from one /proc snapshot
+    procfs = procfs_views()
+
+    # Commands derived from one multi-view command (rpm)
+    derived = multiview_commands(args, linux_config['commands'], progress)
+
+    commands = []
     for tag, cmd in linux_config['commands'].items():
         # filter lsblk depending on the version of util-linux
         if tag == 'lsblk_long' and lsblk_version.startswith('2.1'):
             continue
         if tag == 'lsblk_el6' and not lsblk_version.startswith('2.1'):
             continue
+        commands.append((tag, cmd))
+
+    def run(tag, cmd):
+        if tag in derived:
+            return derived[tag]
+        if tag in procfs:
+            return procfs_command(args, cmd, procfs[tag], progress)
+        return JSONPlusCommand(args, cmd=cmd, progress=progress)
 
-        df = JSONPlusCommand(args, cmd=cmd, progress=progress)
+    for tag, df in run_commands(run, commands, COMMAND_TASKS, command_hints):
         archive.writestr('cmd/{0}.jsonp'.format(tag), df.jsonp())
 
 def get_linux_files(args, archive):
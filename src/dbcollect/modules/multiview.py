@@ -0,0 +1,211 @@
+"""
+multiview.py - Derive the output of several commands from one invocation
+Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
+License: GPLv3+
+
+rpm -qa (3 query formats), lshw (-short and -json) and vgs/pvs/lvs each scan
+the whole system on every run. A multi-view command runs the richest form once and renders the
+other archive entries from its output. The entries keep their cmd/*.jsonp names and
+original command, with the multi-view command in the "source" field.
+The default lshw output is not derived, as lshw -json has no resources (irq, ioport, memory).
+If the multi-view command fails or its output cannot be parsed, the original commands are run.
+"""
+
+import json, logging
+from collections import OrderedDict
+
+from lib.config import COMMAND_TASKS, command_hints
+from lib.jsonfile import JSONPlusCommand
+from lib.multiproc import run_commands
+
+RPM_END   = '@@END@@'
+RPM_QUERY = 'rpm -qa --queryformat ' + '\\t'.join(['%{name}', '%{version}', '%{release}', '%{vendor}', '%{packager}',
+    '%{distribution}', '%{size}', '%{url}', '%{summary}', '%{description}']) + '\\n' + RPM_END + '\\n'
+
+def rpm_views(data):
+    """Render the rpm_packages* query formats from the superset query"""
+    views = { 'rpm_packages': [], 'rpm_packages_long': [], 'rpm_packages_desc': [] }
+    records = data.split('\n' + RPM_END + '\n')
+    if records[-1] == '':
+        records.pop()
+
+    for record in records:
+        fields = record.split('\t', 9)
+        if len(fields) != 10:
+            raise ValueError('Invalid rpm record: {0}'.format(record[:80]))
+
+        views['rpm_packages'].append('|'.join(fields[0:3] + [fields[8]]) + '\n')
+        views['rpm_packages_long'].append('|'.join(fields[0:9]) + '\n')
+        views['rpm_packages_desc'].append('|'.join(fields[0:3] + [fields[9]]) + '\n')
+
+    return dict([(tag, ''.join(lines)) for tag, lines in views.items()])
+
+def kilobytes(value):
+    """lshw binary units: 4GiB, 465GiB"""
+    prefixes = 'KMGTPEZY'
+    i = 0
+    while i <= len(prefixes) and (value > 10240 or value % 1024 == 0):
+        value = value >> 10
+        i += 1
+    if 0 < i <= len(prefixes):
+        return '{0}{1}iB'.format(value, prefixes[i - 1])
+    return '{0}iB'.format(value)
+
+def decimalkilos(value):
+    """lshw decimal units: 2899M(Hz), 1G(bit/s), 500G(B)"""
+    prefixes = 'KMGTPEZY'
+    i = 0
+    while i <= len(prefixes) and (value > 10000 or value % 1000 == 0):
+        value = value // 1000
+        i += 1
+    if 0 < i <= len(prefixes):
+        return '{0}{1}'.format(value, prefixes[i - 1])
+    return str(value)
+
+def lshw_logicalnames(node):
+    """logicalname is a string or a list"""
+    names = node.get('logicalname', [])
+    if not isinstance(names, list):
+        names = [names]
+    return names
+
+def lshw_paths(node, prefix, rows):
+    """
+    Collect the (H/W path, device, class, description) rows for lshw -short.
+    Like lshw, memory shows the description (not the part number) and memory, storage,
+    volume and disk are prefixed with their size
+    """
+    path = prefix + '/' + node['physid'] if node.get('physid') else ''
+    description = ''
+    if node.get('class') != 'memory':
+        description = node.get('product', '')
+    description = description or node.get('description', '')
+    if node.get('size') and node.get('units') == 'bytes':
+        if node.get('class') in ('memory', 'storage', 'volume'):
+            description = (kilobytes(int(node['size'])) + ' ' + description).rstrip()
+        elif node.get('class') == 'disk':
+            description = (decimalkilos(int(node['size'])) + 'B ' + description).rstrip()
+
+    names = lshw_logicalnames(node)
+    rows.append((path, names[0] if names else '', node.get('class', ''), description))
+    for child in node.get('children', []):
+        lshw_paths(child, path, rows)
+
+def lshw_views(data):
+    """Render the lshw -short output from lshw -json"""
+    nodes = json.loads(data, object_pairs_hook=OrderedDict)
+    if not isinstance(nodes, list):
+        nodes = [nodes]
+
+    rows = [('H/W path', 'Device', 'Class', 'Description')]
+    for node in nodes:
+        lshw_paths(node, '', rows)
+
+    widths = [max([len(row[i]) for row in rows]) for i in range(3)]
+    short  = []
+    for row in rows:
+        short.append(''.join([row[i].ljust(widths[i] + 2) for i in range(3)]) + row[3])
+    short.insert(1, '=' * len(short[0]))
+
+    return { 'lshw_short': '\n'.join(short) + '\n' }
+
+# Columns of the vgs, pvs and lvs commands in linux_config (defaults plus the extra -o columns), with the headings
+LVM_COLUMNS = {
+    'vg': [('vg_name', 'VG'), ('pv_count', '#PV'), ('lv_count', '#LV'), ('snap_count', '#SN'), ('vg_attr', 'Attr'),
+           ('vg_size', 'VSize'), ('vg_free', 'VFree'), ('vg_fmt', 'Fmt'), ('vg_uuid', 'VG UUID')],
+    'pv': [('pv_name', 'PV'), ('vg_name', 'VG'), ('pv_fmt', 'Fmt'), ('pv_attr', 'Attr'), ('pv_size', 'PSize'),
+           ('pv_free', 'PFree'), ('pv_uuid', 'PV UUID'), ('pv_missing', 'Missing'), ('pv_in_use', 'InUse')],
+    'lv': [('lv_name', 'LV'), ('vg_name', 'VG'), ('lv_attr', 'Attr'), ('lv_size', 'LSize'), ('pool_lv', 'Pool'),
+           ('origin', 'Origin'), ('data_percent', 'Data%'), ('metadata_percent', 'Meta%'), ('move_pv', 'Move'),
+           ('mirror_log', 'Log'), ('copy_percent', 'Cpy%Sync'), ('convert_lv', 'Convert'), ('lv_uuid', 'LV UUID')],
+    'seg': [('lv_uuid', None), ('stripes', '#Str'), ('stripe_size', 'Stripe'), ('chunk_size', 'Chunk')],
+}
+
+LVM_REPORT = 'lvm fullreport --reportformat json --units m --nosuffix ' + ' '.join(
+    ['--configreport {0} -o {1}'.format(report, ','.join([col for col, _ in LVM_COLUMNS[report]])) for report in ('vg', 'pv', 'lv', 'seg')])
+
+def lvm_table(report, rows):
+    """Render rows like the LVM reporting commands with --separator tab"""
+    columns = [col for col in LVM_COLUMNS[report] if col[1]]
+    if report == 'lv':
+        columns += [col for col in LVM_COLUMNS['seg'] if col[1]]
+    lines = ['  ' + '\t'.join([heading for _, heading in columns])]
+    for row in rows:
+        lines.append('  ' + '\t'.join([row.get(col, '') for col, _ in columns]))
+    return '\n'.join(lines) + '\n'
+
+def lvm_views(data):
+    """Render vgs, pvs and lvs from one lvm fullreport. lvs has a row per segment and no hidden LVs, like lvs"""
+    vgs, pvs, lvs, segs = [], [], [], {}
+    for report in json.loads(data)['report']:
+        vgs.extend(report.get('vg', []))
+        pvs.extend(report.get('pv', []))
+        lvs.extend([lv for lv in report.get('lv', []) if not lv['lv_name'].startswith('[')])
+        for seg in report.get('seg', []):
+            segs.setdefault(seg['lv_uuid'], []).append(seg)
+
+    lvsegs = []
+    for lv in sorted(lvs, key=lambda lv: (lv['vg_name'], lv['lv_name'])):
+        for seg in segs.get(lv['lv_uuid'], [{}]):
+            row = dict(lv)
+            row.update(seg)
+            lvsegs.append(row)
+
+    return {
+        'vgs': lvm_table('vg', sorted(vgs, key=lambda vg: vg['vg_name'])),
+        'pvs': lvm_table('pv', sorted(pvs, key=lambda pv: pv['pv_name'])),
+        'lvs': lvm_table('lv', lvsegs),
+    }
+
+class MultiView():
+    """A command that is run once, with the output of the commands for tags derived from it by render()"""
+    def __init__(self, command, render, tags):
+        self.command = command
+        self.render  = render
+        self.tags    = tags
+
+multiviews = [
+    MultiView(RPM_QUERY, rpm_views, ('rpm_packages', 'rpm_packages_long', 'rpm_packages_desc')),
+    MultiView('lshw -json', lshw_views, ('lshw_json', 'lshw_short')),
+    MultiView(LVM_REPORT, lvm_views, ('vgs', 'pvs', 'lvs')),
+]
+
+def multiview_commands(args, commands, progress=None):
+    """
+    Run the multi-view commands for the tags in commands (tag: command) and
+    return the JSONPlusCommand objects by tag. Tags that are not returned must be run as usual.
+    """
+    def run(_, cmd):
+        return JSONPlusCommand(args, cmd=cmd, progress=progress)
+
+    views  = [view for view in multiviews if [tag for tag in view.tags if tag in commands]]
+    runs   = run_commands(run, [(view.tags[0], view.command) for view in views], COMMAND_TASKS, command_hints)
+    result = {}
+    for view, (_, jp) in zip(views, runs):
+        tags = [tag for tag in view.tags if tag in commands]
+        if jp.info['status'] != 'OK':
+            logging.debug('%s: status %s, running the original commands', view.command, jp.info['status'])
+            continue
+
+        try:
+            outputs = view.render(jp.data)
+
+        except (ValueError, KeyError, TypeError) as e:
+            logging.debug('%s: cannot derive output (%s), running the original commands', view.command, e)
+            outputs = {}
+
+        for tag in tags:
+            if commands[tag] == view.command:
+                result[tag] = jp
+
+            elif tag in outputs:
+                df = JSONPlusCommand(args, cmd=None)
+                df.set('command', commands[tag])
+                df.set('source', view.command)
+                df.set('status', jp.info['status'])
+                df.set('returncode', jp.info['returncode'])
+                df.errors = jp.errors
+                df.data   = outputs[tag]
+                result[tag] = df
+
+    return result
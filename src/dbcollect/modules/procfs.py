@@ -0,0 +1,278 @@
+"""
+procfs.py - Process, sysctl and kernel module listings from /proc
+Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
+License: GPLv3+
+
+Renders the output of "ps -ef", "ps faux", "ps -eo <long format>", "sysctl -a" and "lsmod"
+from a single pass over /proc, so the process listings are from one consistent snapshot
+and no external commands are needed (one ps scan per listing is expensive on hosts with
+many thousands of processes).
+"""
+
+import sys, os, re, time, logging
+
+from lib.compat import load_file, listentries
+from lib.user import getuser
+
+# Argument separators and control characters are shown as spaces
+CONTROL  = re.compile(r'[\x00-\x1f\x7f]')
+# Parameters that sysctl -a does not show (reading stat_refresh triggers a refresh of the vm counters)
+SYSCTL_SKIP = ('base_reachable_time', 'retrans_time', 'stat_refresh')
+POLICIES = { 0: 'TS', 1: 'FF', 2: 'RR', 3: 'B', 4: 'ISO', 5: 'IDL', 6: 'DLN' }
+
+def read_text(path):
+    """Read a /proc file as text, replacing undecodable bytes (kept as-is on Python 2)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if sys.version_info[0] == 2:
+        return data
+    return data.decode('utf-8', 'replace')
+
+def ttyname(tty_nr):
+    """Convert the tty device number from /proc/<pid>/stat to the name as shown by ps"""
+    major = (tty_nr >> 8) & 0xfff
+    minor = (tty_nr & 0xff) | ((tty_nr >> 12) & 0xfff00)
+    if 136 <= major <= 143:
+        return 'pts/{0}'.format(minor + (major - 136) * 256)
+    if major == 4:
+        return 'tty{0}'.format(minor) if minor < 64 else 'ttyS{0}'.format(minor - 64)
+    if major == 5 and minor == 1:
+        return 'console'
+    return '?'
+
+def user_column(uid):
+    """Username for the 8 character USER/UID columns, truncated with + like ps does"""
+    try:
+        name = getuser(uid)
+    except KeyError:
+        return str(uid)
+    if len(name) > 8:
+        return name[:7] + '+'
+    return name
+
+def start_column(start, now):
+    """STIME/START column: HH:MM if started today, MmmDD if started this year, else the year"""
+    started = time.localtime(start)
+    current = time.localtime(now)
+    if started.tm_year != current.tm_year:
+        return time.strftime('%Y', started)
+    if started.tm_yday != current.tm_yday:
+        return time.strftime('%b%d', started)
+    return time.strftime('%H:%M', started)
+
+def cputime(seconds):
+    """[DD-]HH:MM:SS"""
+    days, seconds = divmod(seconds, 86400)
+    text = '{0:02}:{1:02}:{2:02}'.format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+    if days:
+        return '{0}-{1}'.format(days, text)
+    return text
+
+class ProcSnapshot():
+    """
+    Snapshot of all processes in /proc, taken once and rendered in the ps formats that dbcollect
+    collects. Processes that disappear during the scan are skipped.
+    """
+    def __init__(self):
+        self.hertz    = os.sysconf('SC_CLK_TCK')
+        self.pagekb   = os.sysconf('SC_PAGE_SIZE') // 1024
+        self.now      = time.time()
+        self.uptime   = float(load_file('/proc/uptime').split()[0])
+        self.btime    = 0
+        self.memtotal = 0
+        for line in load_file('/proc/stat').splitlines():
+            if line.startswith('btime '):
+                self.btime = int(line.split()[1])
+        for line in load_file('/proc/meminfo').splitlines():
+            if line.startswith('MemTotal:'):
+                self.memtotal = int(line.split()[1])
+
+        self.procs = []
+        for name, path, _, _ in listentries('/proc'):
+            if not name.isdigit():
+                continue
+            try:
+                self.procs.append(self.read_proc(int(name), path))
+            except (IOError, OSError, ValueError, IndexError):
+                continue
+        self.procs.sort(key=lambda p: p['pid'])
+        logging.debug('procfs snapshot: %s processes', len(self.procs))
+
+    def read_proc(self, pid, path):
+        """Read the stat, status and cmdline of a process"""
+        stat = read_text(os.path.join(path, 'stat'))
+        comm = stat[stat.index('(') + 1:stat.rindex(')')]
+        rest = stat[stat.rindex(')') + 2:].split()
+
+        proc = { 'pid': pid, 'comm': comm, 'uid': 0, 'locked': False }
+        for line in read_text(os.path.join(path, 'status')).splitlines():
+            if line.startswith('Uid:'):
+                proc['uid'] = int(line.split()[2]) # Effective uid
+            elif line.startswith('VmLck:'):
+                proc['locked'] = int(line.split()[1]) > 0
+            elif line.startswith('VmRSS:'):
+                proc['vmrss'] = int(line.split()[1])
+
+        cmdline = read_text(os.path.join(path, 'cmdline')).rstrip('\0')
+        proc['args'] = CONTROL.sub(' ', cmdline) if cmdline else '[{0}]'.format(comm)
+        proc['kernel'] = not cmdline
+
+        proc['state']   = rest[0]
+        proc['ppid']    = int(rest[1])
+        proc['pgrp']    = int(rest[2])
+        proc['session'] = int(rest[3])
+        proc['tty']     = ttyname(int(rest[4]))
+        proc['tpgid']   = int(rest[5])
+        proc['flags']   = (int(rest[6]) >> 6) & 0x7
+        proc['cputime'] = (int(rest[11]) + int(rest[12])) // self.hertz
+        proc['ticks']   = int(rest[11]) + int(rest[12])
+        proc['nice']    = int(rest[16])
+        proc['nlwp']    = int(rest[17])
+        proc['vsz']     = int(rest[20]) // 1024
+        proc['rss']     = proc.pop('vmrss', int(rest[21]) * self.pagekb)
+        text            = int(rest[24]) - int(rest[23]) if proc['vsz'] else 0
+        proc['trs']     = text >> 10
+        proc['drs']     = (int(rest[20]) - text) >> 10
+        proc['policy']  = int(rest[38])
+        proc['elapsed'] = max(0.0, self.uptime - float(rest[19]) / self.hertz)
+        proc['etimes']  = max(0, int(self.uptime) - int(rest[19]) // self.hertz)
+        proc['start']   = self.btime + int(rest[19]) // self.hertz
+        return proc
+
+    def pcpu(self, proc):
+        """CPU utilization in tenths of a percent"""
+        if proc['elapsed'] <= 0:
+            return 0
+        return min(999, int(proc['ticks'] * 1000 / self.hertz / proc['elapsed']))
+
+    def ps_ef(self):
+        """ps -ef"""
+        lines = ['UID        PID  PPID  C STIME TTY          TIME CMD']
+        for proc in self.procs:
+            lines.append('{0:<8} {1:>5} {2:>5} {3:>2} {4:<5} {5:<8} {6:>8} {7}'.format(
+                user_column(proc['uid']), proc['pid'], proc['ppid'], min(99, self.pcpu(proc) // 10),
+                start_column(proc['start'], self.now), proc['tty'], cputime(proc['cputime']), proc['args']))
+        return '\n'.join(lines) + '\n'
+
+    def ps_faux(self):
+        """ps faux - BSD user format with the process tree"""
+        pids     = set(proc['pid'] for proc in self.procs)
+        children = {}
+        roots    = []
+        for proc in self.procs:
+            # Like ps, children of init are shown as separate trees
+            if proc['ppid'] in pids and proc['ppid'] not in (1, proc['pid']):
+                children.setdefault(proc['ppid'], []).append(proc)
+            else:
+                roots.append(proc)
+
+        # Kernel threads (kthreadd) first
+        roots.sort(key=lambda p: (not p['kernel'], p['pid']))
+
+        lines = ['USER       PID %CPU %MEM    VSZ   RSS TTY      STAT START   TIME COMMAND']
+        # Stack of (process, levels), levels has a flag for each ancestor level with more siblings below
+        stack = [(proc, []) for proc in reversed(roots)]
+        while stack:
+            proc, levels = stack.pop()
+            stat = proc['state']
+            if proc['nice'] < 0:
+                stat += '<'
+            elif proc['nice'] > 0:
+                stat += 'N'
+            if proc['locked']:
+                stat += 'L'
+            if proc['session'] == proc['pid']:
+                stat += 's'
+            if proc['nlwp'] > 1:
+                stat += 'l'
+            if proc['pgrp'] == proc['tpgid']:
+                stat += '+'
+            prefix = ''
+            if levels:
+                prefix = ''.join([' |  ' if sibling else '    ' for sibling in levels[:-1]]) + ' \\_ '
+            pmem = proc['rss'] * 1000 // self.memtotal if self.memtotal else 0
+            pcpu = self.pcpu(proc)
+            lines.append('{0:<8} {1:>5} {2:>2}.{3} {4:>2}.{5} {6:>6} {7:>5} {8:<8} {9:<4} {10:>5} {11:>3}:{12:02} {13}{14}'.format(
+                user_column(proc['uid']), proc['pid'], pcpu // 10, pcpu % 10, pmem // 10, pmem % 10,
+                proc['vsz'], proc['rss'], proc['tty'], stat, start_column(proc['start'], self.now),
+                proc['cputime'] // 60, proc['cputime'] % 60, prefix, proc['args']))
+
+            kids = children.get(proc['pid'], [])
+            for i in reversed(range(len(kids))):
+                stack.append((kids[i], levels + [i < len(kids) - 1]))
+
+        return '\n'.join(lines) + '\n'
+
+    def ps_long(self):
+        """ps -eo pid,ppid,lstart,cputimes,etimes,flags,nlwp,vsz,rss,drs,trs,sz,sched,policy,args"""
+        lines = ['  PID  PPID                  STARTED     TIME ELAPSED F NLWP    VSZ   RSS   DRS  TRS    SZ SCH POL COMMAND']
+        for proc in self.procs:
+            lines.append('{0:>5} {1:>5} {2:>24} {3:>8} {4:>7} {5} {6:>4} {7:>6} {8:>5} {9:>5} {10:>4} {11:>5} {12:>3} {13:<3} {14}'.format(
+                proc['pid'], proc['ppid'], time.asctime(time.localtime(proc['start'])), proc['cputime'], proc['etimes'],
+                proc['flags'], proc['nlwp'], proc['vsz'], proc['rss'], proc['drs'], proc['trs'],
+                proc['vsz'] // self.pagekb if self.pagekb else 0, proc['policy'], POLICIES.get(proc['policy'], '?'), proc['args']))
+        return '\n'.join(lines) + '\n'
+
+def sysctl_all(top='/proc/sys'):
+    """
+    sysctl -a: all readable kernel parameters as "key = value" (one line per line of the value),
+    sorted by key. Write-only and unreadable parameters are skipped, like sysctl does.
+    """
+    lines = []
+    stack = [top]
+    while stack:
+        path = stack.pop()
+        if path == top or os.path.isdir(path) and not os.path.islink(path):
+            try:
+                stack.extend(reversed([entry[1] for entry in listentries(path)]))
+            except OSError:
+                pass
+            continue
+        if os.path.basename(path) in SYSCTL_SKIP:
+            continue
+        try:
+            value = read_text(path)
+        except (IOError, OSError):
+            continue
+
+        # Dots in names (i.e. VLAN interfaces) are shown as slashes
+        key = '.'.join([part.replace('.', '/') for part in path[len(top) + 1:].split('/')])
+        for line in value.rstrip('\n').split('\n'):
+            lines.append('{0} = {1}'.format(key, line))
+
+    return '\n'.join(lines) + '\n'
+
+def lsmod(path='/proc/modules'):
+    """lsmod: loaded kernel modules from /proc/modules"""
+    lines = ['Module                  Size  Used by']
+    for line in load_file(path).splitlines():
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        name, size, refcnt, holders = fields[:4]
+        text = '{0:<19} {1:>8}  {2}'.format(name, size, refcnt)
+        holders = holders.strip('-').rstrip(',')
+        if holders:
+            text += ' ' + holders
+        lines.append(text)
+    return '\n'.join(lines) + '\n'
+
+def procfs_views():
+    """
+    Take a process snapshot and return the procfs renderers by command tag.
+    Returns an empty dict if /proc cannot be read so the commands are used instead.
+    """
+    try:
+        snapshot = ProcSnapshot()
+
+    except (IOError, OSError, ValueError) as e:
+        logging.debug('procfs snapshot failed: %s', e)
+        return {}
+
+    return {
+        'ps_ef':   snapshot.ps_ef,
+        'ps_faux': snapshot.ps_faux,
+        'ps_long': snapshot.ps_long,
+        'sysctl':  sysctl_all,
+        'lsmod':   lsmod,
+    }
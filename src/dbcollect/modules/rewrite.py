@@ -0,0 +1,160 @@
+"""
+rewrite.py - Rewrite an existing dbcollect archive (strip AWR reports, recompress)
+Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
+License: GPLv3+
+
+Members are copied one by one into a new archive with the same comment (dbcollect magic string)
+and order. With --strip, the AWR reports are stripped in a pool of processes (each with its own
+handle on the input archive), at most 2 results per worker are in flight. With --compression,
+all members are recompressed. Nothing is extracted to disk. Exits with 10 if the rewrite failed
+or a report could not be stripped (the report is copied unchanged).
+"""
+
+import os, sys, shutil, logging, zipfile
+from io import BytesIO
+from collections import deque
+from multiprocessing import Pool, cpu_count
+from xml.parsers.expat import ExpatError
+
+from lib.compat import strerror
+from lib.errors import Errors
+from modules.awrstrip import get_stripper, is_awr_report, CHUNKSIZE
+
+COMPRESSION = {
+    'store':   zipfile.ZIP_STORED,
+    'deflate': zipfile.ZIP_DEFLATED,
+    'bzip2':   getattr(zipfile, 'ZIP_BZIP2', None),
+    'lzma':    getattr(zipfile, 'ZIP_LZMA', None),
+}
+
+_zin = None
+
+def open_input(path):
+    """Pool initializer: open the input archive once per worker"""
+    global _zin # pylint: disable=global-statement
+    _zin = zipfile.ZipFile(path)
+
+def strip_member(name):
+    """Strip an AWR report in the input archive. Returns the stripped data, None if unchanged or False if not valid"""
+    out      = BytesIO()
+    stripper = get_stripper(name, out)
+    try:
+        f = _zin.open(name)
+        try:
+            while True:
+                data = f.read(CHUNKSIZE)
+                stripper.feed(data, final=not data)
+                if not data:
+                    break
+        finally:
+            f.close()
+
+    except ExpatError:
+        logging.error(Errors.E006, name)
+        return False
+
+    if stripper.changed:
+        return out.getvalue()
+    return None
+
+def stripped(zippath, names, workers):
+    """Generator that strips the members in a pool of processes, yields the results in the order of names"""
+    if workers < 2 or len(names) < 2:
+        open_input(zippath)
+        for name in names:
+            yield strip_member(name)
+        return
+
+    # Pool.imap queues all names at once and buffers the results that are not consumed yet,
+    # so submit a limited number of members ahead of the one that is written next
+    workers = min(workers, len(names))
+    pool    = Pool(workers, open_input, (zippath,))
+    pending = deque()
+    try:
+        for name in names:
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(strip_member, (name,)))
+
+        while pending:
+            yield pending.popleft().get()
+
+    finally:
+        pool.close()
+        pool.join()
+
+def copy_member(zin, zout, info, zinfo):
+    """Copy a member without strip, streaming in chunks where zipfile supports writing to a member (Python 3.6+)"""
+    if sys.version_info >= (3, 6):
+        with zin.open(info) as src, zout.open(zinfo, 'w', force_zip64=info.file_size > 0x7fffffff) as dst:
+            shutil.copyfileobj(src, dst, CHUNKSIZE)
+    else:
+        zout.writestr(zinfo, zin.read(info))
+
+def rewrite(args):
+    """Rewrite the archive given with --rewrite to a new archive, stripped and/or recompressed"""
+    path = args.rewrite
+    if args.filename:
+        outpath = args.filename if args.filename.endswith('.zip') else args.filename + '.zip'
+    else:
+        outpath = os.path.splitext(path)[0] + '-rewrite.zip'
+
+    if os.path.realpath(outpath) == os.path.realpath(path):
+        logging.error(Errors.E052, outpath)
+        sys.exit(10)
+
+    compress_type = None
+    if args.compression:
+        compress_type = COMPRESSION[args.compression]
+        if compress_type is None:
+            logging.error(Errors.E051, args.compression)
+            sys.exit(10)
+
+    failed = 0
+    try:
+        zin = zipfile.ZipFile(path)
+        if not zin.comment.startswith(b'dbcollect'):
+            logging.error(Errors.E050, path)
+            sys.exit(10)
+
+        infos   = zin.infolist()
+        strip   = [info.filename for info in infos if args.strip and is_awr_report(info.filename)]
+        results = stripped(path, strip, args.tasks or cpu_count())
+
+        logging.info('Rewriting %s to %s (%s reports to strip)', path, outpath, len(strip))
+        zout = zipfile.ZipFile(outpath, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        zout.comment = zin.comment
+        try:
+            for info in infos:
+                zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+                zinfo.compress_type = info.compress_type if compress_type is None else compress_type
+                zinfo.external_attr = info.external_attr
+                zinfo.comment       = info.comment
+
+                data = None
+                if args.strip and is_awr_report(info.filename):
+                    data = next(results)
+                if data is False:
+                    failed += 1
+                if data:
+                    zout.writestr(zinfo, data)
+                else:
+                    copy_member(zin, zout, info, zinfo)
+
+        finally:
+            zout.close()
+            zin.close()
+
+    except zipfile.BadZipfile:
+        logging.error(Errors.E050, path)
+        sys.exit(10)
+
+    except (IOError, OSError) as e:
+        logging.error(Errors.E007, e.filename, strerror(e.errno))
+        sys.exit(10)
+
+    if failed:
+        logging.error('Zip file %s is created, %s reports could not be stripped', outpath, failed)
+        sys.exit(10)
+
+    logging.info('Zip file %s is created', outpath)
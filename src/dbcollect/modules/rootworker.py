@@ -1,14 +1,54 @@
 
 import os, sys, logging, platform
+from threading import Thread, Event, Lock
 from subprocess import Popen, PIPE
 
-from lib.compat import Progress, decode, Full, execute, strerror
+from lib.compat import Progress, decode, strerror
 from lib.errors import Errors
-from lib.config import linux_config, hpux_config, ROOTQUEUE_TIMEOUT
+from lib.config import linux_config, hpux_config, command_hints, KEEPALIVE_INTERVAL, COMMAND_TASKS
+from lib.multiproc import run_commands
+from lib.scheduler import Scheduler
 from lib.jsonfile import JSONPlusCommand, FileInfo
+from modules.multiview import multiview_commands
+from modules.linux import multipath_maps
+from modules.pacct import read_pacct_files, sa_summary
 
 # pylint: disable=consider-using-with
 
+# Notice sent by the root worker to show it is still running
+KEEPALIVE = 'keepalive'
+
+class Spool():
+    """Writes root task results to the spool directory and notifies the receiver"""
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.count    = 0
+        self.lock     = Lock()
+
+    def put(self, jp):
+        """
+        Save a JSONPlus object as file and send its name. The file must be new
+        (no existing files or symlinks are overwritten), owned by and only readable for the dbcollect user
+        """
+        with self.lock:
+            self.count += 1
+            filename = '{0:05}.jsonp'.format(self.count)
+        path = os.path.join(self.exchange.spooldir, filename)
+        fd   = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+        os.fchown(fd, self.exchange.uid, self.exchange.gid)
+        os.fchmod(fd, 0o600)
+        f = os.fdopen(fd, 'w')
+        try:
+            f.write(jp.jsonp())
+        finally:
+            f.close()
+        self.exchange.queue.put((jp.name, filename))
+
+def keepalive(exchange, done):
+    """Send heartbeats until done, so the receiver does not time out on long running root tasks"""
+    while not done.wait(KEEPALIVE_INTERVAL):
+        exchange.queue.put(KEEPALIVE)
+
 def get_acct_files():
     """Find linux process accounting files (Debian and RHEL based)"""
     for topdir in ('/var/account', '/var/log/account'):
@@ -22,7 +62,7 @@ def get_acct_files():
                 yield path
 
 def parse_pacct(args, path):
-    """Parse a binary linux accounting file using "sa". Uncompress .gz files first"""
+    """Parse a binary linux accounting file using "sa" (for files the native decoder cannot read). Uncompress .gz files first"""
     jpcmd = JSONPlusCommand(args, cmd=None)
     jpcmd.name = 'cmd_root/sa-{0}.jsonp'.format(os.path.basename(path))
 
@@ -63,7 +103,20 @@ def parse_pacct(args, path):
 
     return jpcmd
 
-def get_accounting(args, rootqueue):
+def pacct_summary(args, path, result):
+    """Summary of a linux accounting file from the native decoder, in "sa -a -b -j" format"""
+    jpcmd = JSONPlusCommand(args, cmd=None)
+    jpcmd.name = 'cmd_root/sa-{0}.jsonp'.format(os.path.basename(path))
+    jpcmd.set('fileinfo', FileInfo(path).dict)
+    jpcmd.set('command', 'sa -a -b -j {0}'.format(path))
+    jpcmd.set('source', 'pacct')
+    jpcmd.set('records', result['records'])
+    jpcmd.set('status', 'OK')
+    jpcmd.set('returncode', 0)
+    jpcmd.data = sa_summary(result['commands'])
+    return jpcmd
+
+def get_accounting(args, spool):
     """Get process accounting info on Linux"""
     system = platform.system()
 
@@ -75,33 +128,34 @@ def get_accounting(args, rootqueue):
         logging.info('Skipping process accounting (Linux only)')
         return
 
-    try:
-        # Test if "sa" command exists
-        if not os.path.isfile('/usr/bin/sa'):
-            logging.debug('sa executable not found, skipping process accounting')
-            return
-        execute('sa -V')
-
-    except OSError as e:
-        logging.warning(Errors.W005, e.filename, strerror(e.errno))
+    # "sa" is only needed for files the native decoder cannot read
+    has_sa = os.path.isfile('/usr/bin/sa')
 
     logging.info('Collecting process accounting stats')
 
     progress = Progress(args)
     try:
-        # Process accounting files
-        for path in get_acct_files():
+        # Process accounting files, decoded in parallel
+        paths = list(get_acct_files())
+        for path, result in zip(paths, read_pacct_files(paths)):
             msg = 'Processing accounting file %s' % path
             progress.message(msg)
-            jf = parse_pacct(args, path)
-            rootqueue.put(jf, timeout=ROOTQUEUE_TIMEOUT)
+            if 'error' not in result:
+                jf = pacct_summary(args, path, result)
+            elif has_sa:
+                logging.debug('%s: %s, using sa', path, result['error'])
+                jf = parse_pacct(args, path)
+            else:
+                logging.debug('%s: %s, sa executable not found, skipping', path, result['error'])
+                continue
+            spool.put(jf)
 
     except OSError as e:
         logging.warning(Errors.W005, e.filename, strerror(e.errno))
 
     progress.clear()
 
-def run_root_commands(args, rootqueue):
+def run_root_commands(args, spool):
     """Run the root commands for the OS specified in the config"""
     system = platform.system()
 
@@ -115,10 +169,27 @@ def run_root_commands(args, rootqueue):
         return
 
     progress = Progress(args)
-    for tag, cmd in config['rootcommands'].items():
-        jp = JSONPlusCommand(args, cmd=cmd, progress=progress)
+
+    # Commands derived from one multi-view command (lshw)
+    derived = multiview_commands(args, config['rootcommands'], progress)
+
+    # multipath -ll is slow with many paths, skip it if there are no multipath maps
+    skip_multipath = system == 'Linux' and multipath_maps() == 0
+
+    def run(tag, cmd):
+        if tag in derived:
+            return derived[tag]
+        if tag == 'multipath_ll' and skip_multipath:
+            logging.debug('No multipath maps, skipping %s', cmd)
+            jp = JSONPlusCommand(args, cmd=None)
+            jp.set('command', cmd)
+            jp.set('status', 'SKIPPED')
+            return jp
+        return JSONPlusCommand(args, cmd=cmd, progress=progress)
+
+    for tag, jp in run_commands(run, config['rootcommands'].items(), COMMAND_TASKS, command_hints):
         jp.name = 'cmd_root/{0}.jsonp'.format(tag)
-        rootqueue.put(jp, timeout=ROOTQUEUE_TIMEOUT)
+        spool.put(jp)
 
     progress.clear()
 
@@ -132,24 +203,30 @@ def root_worker(args, exchange):
     # check if user is root and root commands are not disabled
     if args.no_root:
         logging.info('Skipping root commands (--no-root)')
-        exchange.queue.put(None, timeout=ROOTQUEUE_TIMEOUT)
+        exchange.queue.put(None)
 
     elif os.getuid() != 0:
         logging.info('Not running as root, skipping root commands')
-        exchange.queue.put(None, timeout=ROOTQUEUE_TIMEOUT)
+        exchange.queue.put(None)
 
     else:
+        done      = Event()
+        heartbeat = Thread(target=keepalive, args=(exchange, done), name='keepalive')
+        heartbeat.daemon = True
+        heartbeat.start()
         try:
             logging.info('Running root tasks')
-            get_accounting(args, exchange.queue)
-            run_root_commands(args, exchange.queue)
-
-            exchange.queue.put(None, timeout=ROOTQUEUE_TIMEOUT)
-
-        except Full:
-            logging.error(Errors.E045)
-            sys.exit(10)
+            spool     = Spool(exchange)
+            scheduler = Scheduler({})
+            scheduler.add('accounting', get_accounting, (args, spool), main=True)
+            scheduler.add('rootcommands', run_root_commands, (args, spool))
+            scheduler.run()
 
         except Exception as e: # pylint: disable=broad-exception-caught
             logging.exception(Errors.E001, e)
             sys.exit(99)
+
+        finally:
+            done.set()
+            heartbeat.join()
+            exchange.queue.put(None)
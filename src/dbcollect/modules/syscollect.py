@@ -5,53 +5,96 @@ License: GPLv3+
 """
 
 import os, re, platform, logging
-from lib.config import aix_config, sunos_config, hpux_config
+from lib.config import aix_config, sunos_config, hpux_config, command_hints, COMMAND_TASKS
 from lib.jsonfile import JSONPlusCommand, JSONPlusFile
 from lib.errors import Errors
 from lib.compat import execute
+from lib.multiproc import run_commands
 from modules.unix import nmon_info, sar_info
 from modules.linux import get_linux_config, get_linux_sar, get_linux_commands, get_linux_files, get_linux_udev
 
-def host_info(archive, args):
-    """Get OS and run the corresponding OS/SAR module"""
+def host_tasks(scheduler, archive, args):
+    """Add the OS and SAR collection phases to the scheduler. On Linux, each part is a separate task"""
     system = platform.system()
     logging.info('Collecting OS info ({0})'.format(system))
 
     if args.nmon:
-        nmon_info(archive, args)
+        scheduler.add('nmon', nmon_info, (archive, args), resources=('disk',))
 
     if system == 'Linux':
-        linux_info(archive, args)
+        scheduler.add('linux_config',   get_linux_config,   (archive,),      resources=('disk',))
+        scheduler.add('linux_commands', get_linux_commands, (args, archive), resources=('cpu',))
+        scheduler.add('linux_files',    get_linux_files,    (args, archive), resources=('disk',))
+        scheduler.add('linux_udev',     get_linux_udev,     (args, archive), resources=('disk',))
+        scheduler.add('linux_sar',      get_linux_sar,      (args, archive), resources=('cpu', 'disk'))
 
     elif system == 'AIX':
-        aix_info(archive, args)
+        scheduler.add('aix', aix_info, (archive, args), resources=('cpu',))
 
     elif system == 'SunOS':
-        sun_info(archive, args)
+        scheduler.add('sunos', sun_info, (archive, args), resources=('cpu',))
 
     elif system == 'HP-UX':
-        hpux_info(archive, args)
+        scheduler.add('hpux', hpux_info, (archive, args), resources=('cpu',))
 
     else:
         # Check to continue even if platform is unknown?
         logging.error(Errors.E008, system)
 
-def linux_info(archive, args):
-    """System/SAR info for Linux"""
+def store_commands(args, archive, commands, derived=None):
+    """
+    Run the commands ((archive name, command) pairs) concurrently and store them in order.
+    derived has JSONPlusCommand objects by archive name that are stored instead of running the command
+    """
+    derived = derived or {}
+    def run(name, cmd):
+        if name in derived:
+            return derived[name]
+        return JSONPlusCommand(args, cmd=cmd)
+
+    for name, df in run_commands(run, commands, COMMAND_TASKS, command_hints):
+        archive.writestr(name, df.jsonp())
+
+def get_commands(args, archive, commands):
+    """Run the commands (tag: command) concurrently and store them in cmd/ in table order"""
+    store_commands(args, archive, [('cmd/{0}.jsonp'.format(tag), cmd) for tag, cmd in commands.items()])
+
+def aix_lspath(args, disks):
+    """
+    Get the paths of all disks from one lspath run, as the output of "lspath -l <disk> -F parent,status"
+    by archive name. Disks that are not in the output are not returned (nothing is returned if lspath fails)
+    """
+    cmd = 'lspath -F name,parent,status'
+    jp  = JSONPlusCommand(args, cmd=cmd)
+    if jp.info['status'] != 'OK':
+        logging.debug('%s: status %s, running lspath for each disk', cmd, jp.info['status'])
+        return {}
+
+    paths = {}
+    for line in jp.data.splitlines():
+        fields = line.split(',', 1)
+        if len(fields) == 2:
+            paths.setdefault(fields[0], []).append(fields[1] + '\n')
+
+    result = {}
+    for disk in disks:
+        if disk not in paths:
+            continue
+        df = JSONPlusCommand(args, cmd=None)
+        df.set('command', 'lspath -l {0} -F parent,status'.format(disk))
+        df.set('source', cmd)
+        df.set('status', jp.info['status'])
+        df.set('returncode', jp.info['returncode'])
+        df.data = ''.join(paths[disk])
+        result['disk/{0}_lspath.jsonp'.format(disk)] = df
 
-    get_linux_config(archive)
-    get_linux_commands(args, archive)
-    get_linux_files(args, archive)
-    get_linux_udev(args, archive)
-    get_linux_sar(args, archive)
+    return result
 
 def aix_info(archive, args):
     """System/SAR info for AIX (pSeries)"""
     logging.info('Collecting AIX System info')
 
-    for tag, cmd in aix_config['commands'].items():
-        df = JSONPlusCommand(args, cmd=cmd)
-        archive.writestr('cmd/{0}.jsonp'.format(tag), df.jsonp())
+    get_commands(args, archive, aix_config['commands'])
 
     for file in aix_config['files']:
         df = JSONPlusFile(path=file)
@@ -61,41 +104,39 @@ def aix_info(archive, args):
     ifcfg = execute('ifconfig -l')
     lsvg  = execute('lsvg')
 
+    # The paths of all disks come from one lspath run, the other (per device) commands run concurrently
     logging.info('Collecting AIX Disk info')
-    for disk in lsdev.stdout.splitlines():
-        df_size = JSONPlusCommand(args, cmd='getconf DISK_SIZE /dev/{0}'.format(disk))
-        df_cfg  = JSONPlusCommand(args, cmd='lscfg -vpl {0}'.format(disk))
-        df_path = JSONPlusCommand(args, cmd='lspath -l {0} -F parent,status'.format(disk))
-        df_attr = JSONPlusCommand(args, cmd='lsattr -El {0}'.format(disk))
-        archive.writestr('disk/{0}_disksize.jsonp'.format(disk), df_size.jsonp())
-        archive.writestr('disk/{0}_lscfg.jsonp'.format(disk), df_cfg.jsonp())
-        archive.writestr('disk/{0}_lspath.jsonp'.format(disk), df_path.jsonp())
-        archive.writestr('disk/{0}_lsattr.jsonp'.format(disk), df_attr.jsonp())
+    disks    = lsdev.stdout.split()
+    commands = []
+    for disk in disks:
+        commands.append(('disk/{0}_disksize.jsonp'.format(disk), 'getconf DISK_SIZE /dev/{0}'.format(disk)))
+        commands.append(('disk/{0}_lscfg.jsonp'.format(disk),    'lscfg -vpl {0}'.format(disk)))
+        commands.append(('disk/{0}_lspath.jsonp'.format(disk),   'lspath -l {0} -F parent,status'.format(disk)))
+        commands.append(('disk/{0}_lsattr.jsonp'.format(disk),   'lsattr -El {0}'.format(disk)))
+    store_commands(args, archive, commands, aix_lspath(args, disks))
 
     logging.info('Collecting AIX Network info')
+    commands = []
     for nic in ifcfg.stdout.split():
         if nic.startswith('lo'):
             continue
-        df_attr = JSONPlusCommand(args, cmd='lsattr -E -l {0} -F description,value'.format(nic))
-        df_stat = JSONPlusCommand(args, cmd='entstat -d {0}'.format(nic))
-        archive.writestr('nic/{0}_lsattr.jsonp'.format(nic), df_attr.jsonp())
-        archive.writestr('nic/{0}_entstat.jsonp'.format(nic), df_stat.jsonp())
+        commands.append(('nic/{0}_lsattr.jsonp'.format(nic),  'lsattr -E -l {0} -F description,value'.format(nic)))
+        commands.append(('nic/{0}_entstat.jsonp'.format(nic), 'entstat -d {0}'.format(nic)))
+    store_commands(args, archive, commands)
 
     logging.info('Collecting AIX LVM info')
+    commands = []
     for vg in lsvg.stdout.splitlines():
-        df_lvs =  JSONPlusCommand(args, cmd='lsvg -l {0}'.format(vg))
-        df_pvs =  JSONPlusCommand(args, cmd='lsvg -p {0}'.format(vg))
-        archive.writestr('lvm/{0}_lvs.jsonp'.format(vg), df_lvs.jsonp())
-        archive.writestr('lvm/{0}_pvs.jsonp'.format(vg), df_pvs.jsonp())
+        commands.append(('lvm/{0}_lvs.jsonp'.format(vg), 'lsvg -l {0}'.format(vg)))
+        commands.append(('lvm/{0}_pvs.jsonp'.format(vg), 'lsvg -p {0}'.format(vg)))
+    store_commands(args, archive, commands)
 
     sar_info(archive, args)
 
 def sun_info(archive, args):
     """System/SAR info for Sun Solaris (SPARC or Intel)"""
     logging.info('Collecting Solaris System info')
-    for tag, cmd in sunos_config['commands'].items():
-        df = JSONPlusCommand(args, cmd=cmd)
-        archive.writestr('cmd/{0}.jsonp'.format(tag), df.jsonp())
+    get_commands(args, archive, sunos_config['commands'])
 
     for file in sunos_config['files']:
         df = JSONPlusFile(path=file)
@@ -106,13 +147,8 @@ def sun_info(archive, args):
 def hpux_info(archive, args):
     """System/SAR info for HP-UX (Itanium)"""
     logging.info('Collecting HP-UX System info')
-    for tag, cmd in hpux_config['commands'].items():
-        df = JSONPlusCommand(args, cmd=cmd)
-        archive.writestr('cmd/{0}.jsonp'.format(tag), df.jsonp())
-
-    for tag, cmd in hpux_config['rootcommands'].items():
-        df = JSONPlusCommand(args, cmd=cmd)
-        archive.writestr('cmd/{0}.jsonp'.format(tag), df.jsonp())
+    get_commands(args, archive, hpux_config['commands'])
+    get_commands(args, archive, hpux_config['rootcommands'])
 
     for file in hpux_config['files']:
         df = JSONPlusFile(path=file)
@@ -127,10 +163,10 @@ def hpux_info(archive, args):
             if re.match(r'/dev/rdisk/disk\d+$', disk):
                 disks.append(disk)
 
+    commands = []
     for dev in disks:
         disk = os.path.basename(dev)
-        cmd = '/usr/sbin/diskinfo {0}'.format(dev)
-        diskinfo = JSONPlusCommand(args, cmd=cmd)
-        archive.writestr('cmd/diskinfo_{0}.jsonp'.format(disk), diskinfo.jsonp())
+        commands.append(('cmd/diskinfo_{0}.jsonp'.format(disk), '/usr/sbin/diskinfo {0}'.format(dev)))
+    store_commands(args, archive, commands)
 
     sar_info(archive, args)
@@ -0,0 +1,50 @@
+"""
+sysstat.py - Read the header of sysstat (Linux sar) data files
+Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
+License: GPLv3+
+
+A sysstat data file (/var/log/sa/saDD) starts with struct file_magic (magic 0xd596,
+format, sysstat version) followed by struct file_header. Since sysstat 11 file_magic is
+76 bytes and file_header starts with the time of the first sample (sa_ust_time).
+Records are appended during the day, so the modification time is the time of the last sample.
+Files can be written in either byte order (sysstat can read both).
+"""
+
+import os, struct, time
+
+SA_MAGIC        = 0xd596
+FILE_MAGIC      = 'HHBBBB' # sysstat_magic, format_magic, version, patchlevel, sublevel, extraversion
+FILE_MAGIC_SIZE = 76
+FIRST_SANE      = 946684800 # 2000-01-01, older timestamps are not valid
+
+def sa_header(path):
+    """
+    Get the sysstat version and sample period from a sysstat data file:
+    { 'version', 'format', 'first', 'last' } where first is None if not available in this version
+    Raises ValueError if the file is not a sysstat data file
+    """
+    with open(path, 'rb') as f:
+        data = f.read(FILE_MAGIC_SIZE + 8)
+
+    if len(data) < struct.calcsize('<' + FILE_MAGIC):
+        raise ValueError('file too short')
+
+    for order in ('<', '>'):
+        magic, fmt, version, patchlevel, sublevel, _ = struct.unpack_from(order + FILE_MAGIC, data)
+        if magic == SA_MAGIC:
+            break
+    else:
+        raise ValueError('no sysstat magic')
+
+    header = {
+        'version': '{0}.{1}.{2}'.format(version, patchlevel, sublevel),
+        'format':  '0x{0:04x}'.format(fmt),
+        'first':   None,
+        'last':    os.stat(path).st_mtime,
+    }
+    if version >= 11 and len(data) == FILE_MAGIC_SIZE + 8:
+        first = struct.unpack_from(order + 'Q', data, FILE_MAGIC_SIZE)[0]
+        if FIRST_SANE <= first <= max(header['last'], time.time()) + 86400:
+            header['first'] = first
+
+    return header
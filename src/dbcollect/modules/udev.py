@@ -0,0 +1,127 @@
+"""
+udev.py - Read block device properties from the udev database
+Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
+License: GPLv3+
+
+The udev database (/run/udev/data/b<major>:<minor>) has the symlinks (S:),
+properties (E:), tags (G:, Q:) and initialization time (I:) for each block device.
+Combined with the kernel uevent file in sysfs, this provides the same properties as
+"udevadm info -q property" without running udevadm for each device.
+udevadm is only used if there is no database entry for a device.
+"""
+
+import os, re, stat
+
+from lib.compat import load_file, execute, listdir
+
+UDEV_DATA = '/run/udev/data'
+
+class UdevDB():
+    """Reader for the udev database, with an index of the /dev/disk/by-* symlinks"""
+    def __init__(self):
+        self._links = None
+
+    @property
+    def links(self):
+        """Index of the /dev/disk/by-* symlinks (relative to /dev) by (major, minor), built once"""
+        if self._links is None:
+            self._links = {}
+            for bydir in listdir('/dev/disk'):
+                if not bydir.startswith('by-'):
+                    continue
+                directory = os.path.join('/dev/disk', bydir)
+                for link in listdir(directory):
+                    try:
+                        st = os.stat(os.path.join(directory, link))
+                    except OSError:
+                        continue
+                    if stat.S_ISBLK(st.st_mode):
+                        devno = (os.major(st.st_rdev), os.minor(st.st_rdev))
+                        self._links.setdefault(devno, []).append('disk/{0}/{1}'.format(bydir, link))
+
+        return self._links
+
+    def uevent(self, major, minor):
+        """Return the kernel properties of a block device from sysfs, in udevadm order"""
+        sysdev = '/sys/dev/block/{0}:{1}'.format(major, minor)
+        kernel = {}
+        try:
+            for k, v in re.findall(r'^(\w+)=(.*)', load_file(os.path.join(sysdev, 'uevent')), re.M):
+                kernel[k] = v
+        except IOError:
+            pass
+
+        properties = {}
+        if os.path.exists(sysdev):
+            properties['DEVPATH'] = os.path.realpath(sysdev)[len('/sys'):]
+        if 'DEVNAME' in kernel:
+            properties['DEVNAME'] = '/dev/' + kernel.pop('DEVNAME')
+        for k in ('DEVTYPE', 'DISKSEQ', 'PARTN', 'PARTNAME'):
+            if k in kernel:
+                properties[k] = kernel.pop(k)
+        properties['MAJOR'] = kernel.pop('MAJOR', str(major))
+        properties['MINOR'] = kernel.pop('MINOR', str(minor))
+        properties.update(kernel)
+        properties['SUBSYSTEM'] = 'block'
+
+        return properties
+
+    def device(self, major, minor, name):
+        """
+        Get the udev properties and symlinks for block device major:minor (name is used for udevadm)
+        Returns a dict with properties and symlinks, and udevadm_cmd if udevadm failed
+        """
+        info = { 'properties': {}, 'symlinks': [] }
+        try:
+            data = load_file(os.path.join(UDEV_DATA, 'b{0}:{1}'.format(major, minor)))
+
+        except IOError:
+            return self.udevadm(major, minor, name)
+
+        properties = self.uevent(major, minor)
+        tags, current_tags = [], []
+        for line in data.splitlines():
+            key, _, value = line.partition(':')
+            if key == 'S':
+                info['symlinks'].append(value)
+            elif key == 'I':
+                properties['USEC_INITIALIZED'] = value
+            elif key == 'E':
+                k, _, v = value.partition('=')
+                properties[k] = v
+            elif key == 'G':
+                tags.append(value)
+            elif key == 'Q':
+                current_tags.append(value)
+
+        if info['symlinks']:
+            properties['DEVLINKS'] = ' '.join(['/dev/' + link for link in info['symlinks']])
+        if tags:
+            properties['TAGS'] = ':{0}:'.format(':'.join(tags))
+        if current_tags:
+            properties['CURRENT_TAGS'] = ':{0}:'.format(':'.join(current_tags))
+
+        info['properties'] = properties
+        return info
+
+    def udevadm(self, major, minor, name):
+        """Fallback: get the properties and symlinks using udevadm (or sysfs and /dev/disk if udevadm is not available)"""
+        info = { 'properties': {}, 'symlinks': [] }
+        cmd  = 'udevadm info -q symlink -n {0}'.format(name)
+        try:
+            udevadm = execute(cmd)
+
+        except OSError:
+            info['properties'] = self.uevent(major, minor)
+            info['symlinks']   = self.links.get((major, minor), [])
+            return info
+
+        if udevadm.returncode != 0:
+            info['udevadm_cmd'] = { 'command': cmd, 'stdout': udevadm.stdout, 'stderr': udevadm.stderr, 'rc': udevadm.returncode }
+
+        info['symlinks'] = udevadm.stdout.split()
+        udevinfo = execute('udevadm info -q property -n {0}'.format(name))
+        for k, v in re.findall(r'^(\S+)=(.*)', udevinfo.stdout, re.M):
+            info['properties'][k] = v
+
+        return info
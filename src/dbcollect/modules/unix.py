@@ -4,17 +4,84 @@ Copyright (c) 2025 - Bart Sjerps <bart@dirty-cache.com>
 License: GPLv3+
 """
 
-import os, logging
+import os, time, logging
 
 from lib.errors import Errors
 from lib.compat import listdir
+from lib.config import COMMAND_TASKS
 from lib.jsonfile import JSONPlusDirectories, JSONPlusCommand
+from lib.multiproc import run_commands, parallel
+from lib.window import perf_window, daystart, timestamp
+
+# Bytes read from the start of an nmon file for the AAA lines and from the end for the last ZZZZ line
+NMON_HEAD = 8192
+NMON_TAIL = 65536
+MONTHS    = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+
+# Sections of the SAR reports: name, sar option and the columns that identify the section header
+SAR_SECTIONS = (
+    ('cpu',   'u', ('%usr',)),
+    ('block', 'b', ('bread/s',)),
+    ('disk',  'd', ('device',)),
+    ('swap',  'r', ('freemem', 'freeswap', 'slots')),
+)
+
+def nmon_time(date, clock):
+    """
+    Epoch seconds from an nmon date (15-JAN-2024, or 15-JAN-24) and time (00:05:00 or 00.05.00),
+    None if not valid
+    """
+    try:
+        day, month, year = date.split('-')
+        hour, minute, second = clock.replace('.', ':').split(':')
+        year = int(year)
+        if year < 100:
+            year += 2000
+        return time.mktime((year, MONTHS.index(month.upper()) + 1, int(day), int(hour), int(minute), int(second), 0, 0, -1))
+
+    except (ValueError, OverflowError):
+        return None
+
+def nmon_header(path):
+    """
+    Get the time of the first and last sample of an nmon file from the AAA date and time lines
+    and the last ZZZZ line (the modification time if not found), without reading the whole file.
+    Returns (first, last), first is None if unknown. Raises ValueError if the file is not an nmon file
+    """
+    with open(path, 'rb') as f:
+        head = f.read(NMON_HEAD)
+        if not head.startswith(b'AAA,progname'):
+            raise ValueError('not an nmon file')
+        f.seek(0, os.SEEK_END)
+        f.seek(max(len(head), f.tell() - NMON_TAIL))
+        tail = f.read()
+
+    aaa = {}
+    for line in head.splitlines():
+        fields = line.decode('latin-1').strip().split(',')
+        if fields[0] == 'AAA' and len(fields) > 2:
+            aaa[fields[1]] = fields[2]
+    first = nmon_time(aaa.get('date', ''), aaa.get('time', '00:00:00'))
+
+    last = None
+    for line in reversed((head + tail).splitlines()):
+        if line.startswith(b'ZZZZ,'):
+            fields = line.decode('latin-1').strip().split(',')
+            if len(fields) > 3:
+                last = nmon_time(fields[3], fields[2])
+            break
+    if last is None:
+        last = os.stat(path).st_mtime
+
+    return first, last
 
 def nmon_info(archive, args):
-    """Get NMON reports"""
+    """Get the NMON reports with samples in the collection period"""
     nmondirs = args.nmon.split(',')
     nmoninfo = JSONPlusDirectories(*nmondirs)
-    archive.writestr('nmoninfo.json', nmoninfo.dump())
+    window   = perf_window(args)
+    skipped  = []
+    paths    = []
 
     for nmondir in nmondirs:
         if not os.path.exists(nmondir):
@@ -22,22 +89,113 @@ def nmon_info(archive, args):
             continue
         for file in listdir(nmondir):
             path = os.path.join(nmondir, file)
-            with open(path, 'rb') as f:
-                header = f.read(12)
-            if header != b'AAA,progname':
-                logging.error(Errors.E025, path)
-                continue
-            archive.store(path)
+            if os.path.isfile(path):
+                paths.append(path)
+
+    def check(path):
+        try:
+            return nmon_header(path)
+
+        except ValueError:
+            logging.error(Errors.E025, path)
+
+        except (IOError, OSError) as e:
+            logging.debug('%s: %s', path, e)
+
+        return None
+
+    # Reading the headers is I/O bound, the files are checked concurrently
+    for path, header in zip(paths, parallel(check, paths, COMMAND_TASKS)):
+        if header is None:
+            continue
+        first, last = header
+        reason = window.outside(first, last)
+        if reason:
+            logging.debug('Skipping %s: %s', path, reason)
+            skipped.append({ 'path': path, 'reason': reason, 'first': timestamp(first), 'last': timestamp(last) })
+            continue
+        # Copied into the zip file in chunks
+        archive.store(path)
+
+    nmoninfo.set('window', window.dict)
+    nmoninfo.set('skipped', skipped)
+    archive.writestr('nmoninfo.json', nmoninfo.dump())
+
+def sar_split(data):
+    """
+    Split the output of "sar -ubdr" into the output per option, by the section headers.
+    Each section gets the lines before the first header (system info) and its own header, data and averages.
+    Raises ValueError if the sections are not in separate blocks (AIX prints the options per interval)
+    """
+    preamble, sections, current = [], {}, None
+    for line in data.splitlines():
+        words = line.split()
+        name  = None
+        for section, _, columns in SAR_SECTIONS:
+            if [column for column in columns if column in words]:
+                name = section
+
+        if name:
+            if name in sections or (current and len(sections[current]) == 1):
+                raise ValueError('sar sections are not in separate blocks')
+            sections[name] = [line]
+            current = name
+        elif current:
+            sections[current].append(line)
+        else:
+            preamble.append(line)
+
+    if len(sections) != len(SAR_SECTIONS):
+        raise ValueError('sar sections missing')
+
+    return dict([(name, '\n'.join(preamble + lines).rstrip('\n') + '\n') for name, lines in sections.items()])
+
+def sar_file(args, path, split=True):
+    """
+    Get the SAR reports of a file by section (JSONPlusCommand). With split, runs sar once with all options
+    and splits the output, else (or if that fails) runs sar for each option.
+    Returns (reports, layout): layout is True if the output could be split, False if not
+    and None if unknown (not tried or sar failed)
+    """
+    if split:
+        cmd = 'sar -ubdr -f {0}'.format(path)
+        jp  = JSONPlusCommand(args, cmd=cmd)
+        if jp.info['status'] == 'OK':
+            try:
+                outputs = sar_split(jp.data)
+                result  = {}
+                for name, option, _ in SAR_SECTIONS:
+                    df = JSONPlusCommand(args, cmd=None)
+                    df.set('command', 'sar -{0}f {1}'.format(option, path))
+                    df.set('source', cmd)
+                    df.set('status', jp.info['status'])
+                    df.set('returncode', jp.info['returncode'])
+                    df.errors = jp.errors
+                    df.data   = outputs[name]
+                    result[name] = df
+                return result, True
+
+            except ValueError as e:
+                logging.debug('%s: %s, running sar for each option', cmd, e)
+                split = False
+
+        else:
+            split = None
+
+    result = dict([(name, JSONPlusCommand(args, cmd='sar -{0}f {1}'.format(option, path))) for name, option, _ in SAR_SECTIONS])
+    return result, split
 
 def sar_info(archive, args):
-    """Get UNIX SAR reports (Text format)"""
+    """Get UNIX SAR reports (Text format) for the files with samples in the collection period"""
     if args.no_sar:
         return
 
     logging.info('Collecting UNIX SAR reports')
     sarpaths = ('/var/adm/sa','/var/log/sa')
     sarinfo  = JSONPlusDirectories(*sarpaths)
-    archive.writestr('sarinfo.json', sarinfo.dump())
+    window   = perf_window(args)
+    skipped  = []
+    files    = []
 
     for sardir in sarpaths:
         for sarfile in listdir(sardir):
@@ -47,11 +205,36 @@ def sar_info(archive, args):
                 continue
 
             if sarfile.startswith('sa'):
-                df_cpu   = JSONPlusCommand(args, cmd='sar -uf {0}'.format(path))
-                df_block = JSONPlusCommand(args, cmd='sar -bf {0}'.format(path))
-                df_disk  = JSONPlusCommand(args, cmd='sar -df {0}'.format(path))
-                df_swap  = JSONPlusCommand(args, cmd='sar -rf {0}'.format(path))
-                archive.writestr('sar/{0}_{1}.jsonp'.format(sarfile, 'cpu'), df_cpu.jsonp())
-                archive.writestr('sar/{0}_{1}.jsonp'.format(sarfile, 'block'), df_block.jsonp())
-                archive.writestr('sar/{0}_{1}.jsonp'.format(sarfile, 'disk'), df_disk.jsonp())
-                archive.writestr('sar/{0}_{1}.jsonp'.format(sarfile, 'swap'), df_swap.jsonp())
+                # A file has the samples of one day, up to the last modification
+                try:
+                    last = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                reason = window.outside(daystart(last), last)
+                if reason:
+                    logging.debug('Skipping %s: %s', path, reason)
+                    skipped.append({ 'path': path, 'reason': reason, 'last': timestamp(last) })
+                    continue
+                files.append((sarfile, path))
+
+    def store(sarfile, reports):
+        for name, _, _ in SAR_SECTIONS:
+            archive.writestr('sar/{0}_{1}.jsonp'.format(sarfile, name), reports[name].jsonp())
+
+    # The layout of the sar output is the same for all files: files are processed one by one
+    # until it is known if the output can be split, then the others concurrently
+    split = None
+    while files and split is None:
+        sarfile, path = files.pop(0)
+        reports, split = sar_file(args, path)
+        store(sarfile, reports)
+
+    def run(_, path):
+        return sar_file(args, path, split)[0]
+
+    for sarfile, reports in run_commands(run, files, COMMAND_TASKS):
+        store(sarfile, reports)
+
+    sarinfo.set('window', window.dict)
+    sarinfo.set('skipped', skipped)
+    archive.writestr('sarinfo.json', sarinfo.dump())
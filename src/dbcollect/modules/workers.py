@@ -10,11 +10,14 @@ try:
 except ImportError:
     from Queue import Full
 
-from lib.errors import Errors, SQLError, SQLTimeout
+from lib.errors import Errors, CustomException, SQLError, SQLTimeout
 from lib.compat import Progress, load_file, get_pkg_resource, Empty
-from lib.config import dbinfo_config
+from lib.config import dbinfo_config, awrexport_config
+from lib.detect import get_instances
 from lib.jsonfile import JSONPlusDBInfo
 from lib.log import exception_handler
+from .instance import Instance
+from .awrstrip import awrstrip
 
 class Session():
     """SQL*Plus worker session"""
@@ -153,6 +156,23 @@ class Session():
     def runtime(self):
         return round(time.time() - self.start, 2)
 
+def preload_sql():
+    """
+    Load all SQL scripts into the resource registry, so the forked processes
+    don't have to read them from the zipapp again
+    """
+    get_pkg_resource('sql', 'dbinfo/header.sql')
+    get_pkg_resource('sql', 'awrexport/header.sql')
+    for name in ('meta.sql', 'getawrs.sql', 'getsps.sql', 'getdbtime.sql'):
+        get_pkg_resource('sql', name)
+
+    for scripts in dbinfo_config.values():
+        for scriptname in scripts:
+            get_pkg_resource('sql', 'dbinfo/{0}'.format(scriptname))
+
+    for scriptname in awrexport_config:
+        get_pkg_resource('sql', 'awrexport/{0}'.format(scriptname))
+
 def info_processor(shared):
     """info processor - Runs the dbinfo scripts"""
     session = Session(shared)
@@ -160,6 +180,28 @@ def info_processor(shared):
 
     logging.info('%s: DBInfo processor finished, elapsed time %s seconds', shared.instance.sid, session.runtime)
 
+@exception_handler
+def instance_discovery(args, tempdir, instances):
+    """
+    Producer - Detects the instances and submits them, with their jobs, to the instance queue
+    Each instance is submitted as soon as its metadata and job list are ready, so the consumer
+    can start processing it while the next instances are being discovered.
+    """
+    try:
+        for sid, orahome, connectstring in get_instances(args):
+            instance = Instance(tempdir, sid, orahome, connectstring)
+            instance.get_jobs(args)
+            logging.info('{0}: generating {1} workload reports'.format(sid, instance.num_jobs))
+            instances.put(instance)
+
+    except CustomException as e:
+        # Forward known errors to the consumer
+        instances.put(e)
+
+    finally:
+        # Always signal completion
+        instances.put(None)
+
 @exception_handler
 def job_generator(shared):
     """Producer - Submits AWR/SP jobs to the job queue"""
@@ -200,6 +242,19 @@ def job_processor(shared, n):
             logging.error(*e.args)
             sys.exit(20)
 
+        logging.debug('%s: %s generated in %s seconds', shared.instance.sid, job.filename, elapsed)
+
+        # AWR export views run with WHENEVER SQLERROR CONTINUE, the error is kept in the output of the view
+        if job.reptype == 'export':
+            errors = re.findall(r'^ORA-\d+:.*', load_file(spoolfile), re.M)
+            if errors:
+                logging.warning(Errors.W019, shared.instance.sid, job.view, errors[0])
+
+        # If requested, strip AWR report from SQL sections (in the worker, so it scales with the workers)
+        if shared.args.strip and job.reptype == 'awr':
+            awrstrip(spoolfile, inplace=True)
+            logging.debug('Stripped SQL code from {0}'.format(job.filename))
+
         # Move the completed AWR/SP file to the awr dir
         tgtfile = os.path.join(shared.tempdir, 'awr', job.filename)
         os.rename(spoolfile, tgtfile)
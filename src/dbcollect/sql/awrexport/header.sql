@@ -0,0 +1,12 @@
+-------------------------------------------------------------------------------
+-- Title       : header.sql
+-- Description : SQL*Plus settings for the AWR export scripts. A view that fails
+--               (i.e. not available in this version or edition) does not stop the
+--               session, the error is written in the output of that view
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- ----------------------------------------------------------------------------
+
+SET tab off feedback off verify off heading off lines 32767 pages 0 trims on
+ALTER SESSION SET NLS_NUMERIC_CHARACTERS = '.,';
+WHENEVER SQLERROR CONTINUE
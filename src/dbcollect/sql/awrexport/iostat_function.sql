@@ -0,0 +1,29 @@
+-------------------------------------------------------------------------------
+-- Title       : iostat_function.sql
+-- Description : AWR export - IO statistics per database function (cumulative values)
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- Parameters  : dbid, inst, begin_snap, end_snap
+-- Output      : Header line and rows of dba_hist_iostat_function, '|' separated
+-- ----------------------------------------------------------------------------
+
+SELECT 'snap_id|function_name|small_read_megabytes|small_write_megabytes|large_read_megabytes|large_write_megabytes|small_read_reqs|small_write_reqs|large_read_reqs|large_write_reqs|number_of_waits|wait_time' FROM dual;
+
+SELECT snap_id
+  || '|' || function_name
+  || '|' || small_read_megabytes
+  || '|' || small_write_megabytes
+  || '|' || large_read_megabytes
+  || '|' || large_write_megabytes
+  || '|' || small_read_reqs
+  || '|' || small_write_reqs
+  || '|' || large_read_reqs
+  || '|' || large_write_reqs
+  || '|' || number_of_waits
+  || '|' || wait_time
+FROM   dba_hist_iostat_function
+WHERE  dbid = &dbid
+  AND  instance_number = &inst
+  AND  snap_id BETWEEN &begin_snap AND &end_snap
+ORDER BY snap_id, function_id
+/
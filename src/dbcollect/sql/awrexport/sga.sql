@@ -0,0 +1,20 @@
+-------------------------------------------------------------------------------
+-- Title       : sga.sql
+-- Description : AWR export - SGA summary
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- Parameters  : dbid, inst, begin_snap, end_snap
+-- Output      : Header line and rows of dba_hist_sga, '|' separated
+-- ----------------------------------------------------------------------------
+
+SELECT 'snap_id|name|value' FROM dual;
+
+SELECT snap_id
+  || '|' || name
+  || '|' || value
+FROM   dba_hist_sga
+WHERE  dbid = &dbid
+  AND  instance_number = &inst
+  AND  snap_id BETWEEN &begin_snap AND &end_snap
+ORDER BY snap_id, name
+/
@@ -0,0 +1,23 @@
+-------------------------------------------------------------------------------
+-- Title       : snapshots.sql
+-- Description : AWR export - Snapshots (begin/end time, startup time, flags) for the snapshot range
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- Parameters  : dbid, inst, begin_snap, end_snap
+-- Output      : Header line and rows of dba_hist_snapshot, '|' separated
+-- ----------------------------------------------------------------------------
+
+SELECT 'snap_id|begin_interval_time|end_interval_time|startup_time|snap_level|snap_flag' FROM dual;
+
+SELECT snap_id
+  || '|' || to_char(begin_interval_time, 'YYYY-MM-DD HH24:MI:SS')
+  || '|' || to_char(end_interval_time, 'YYYY-MM-DD HH24:MI:SS')
+  || '|' || to_char(startup_time, 'YYYY-MM-DD HH24:MI:SS')
+  || '|' || snap_level
+  || '|' || snap_flag
+FROM   dba_hist_snapshot
+WHERE  dbid = &dbid
+  AND  instance_number = &inst
+  AND  snap_id BETWEEN &begin_snap AND &end_snap
+ORDER BY snap_id
+/
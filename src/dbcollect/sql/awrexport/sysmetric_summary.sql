@@ -0,0 +1,27 @@
+-------------------------------------------------------------------------------
+-- Title       : sysmetric_summary.sql
+-- Description : AWR export - System metrics summary per snapshot interval
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- Parameters  : dbid, inst, begin_snap, end_snap
+-- Output      : Header line and rows of dba_hist_sysmetric_summary, '|' separated
+-- ----------------------------------------------------------------------------
+
+SELECT 'snap_id|begin_time|end_time|metric_name|metric_unit|num_interval|minval|maxval|average|standard_deviation' FROM dual;
+
+SELECT snap_id
+  || '|' || to_char(begin_time, 'YYYY-MM-DD HH24:MI:SS')
+  || '|' || to_char(end_time, 'YYYY-MM-DD HH24:MI:SS')
+  || '|' || metric_name
+  || '|' || metric_unit
+  || '|' || num_interval
+  || '|' || minval
+  || '|' || maxval
+  || '|' || average
+  || '|' || standard_deviation
+FROM   dba_hist_sysmetric_summary
+WHERE  dbid = &dbid
+  AND  instance_number = &inst
+  AND  snap_id BETWEEN &begin_snap AND &end_snap
+ORDER BY snap_id, metric_id
+/
@@ -0,0 +1,20 @@
+-------------------------------------------------------------------------------
+-- Title       : sysstat.sql
+-- Description : AWR export - System statistics (cumulative values)
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- Parameters  : dbid, inst, begin_snap, end_snap
+-- Output      : Header line and rows of dba_hist_sysstat, '|' separated
+-- ----------------------------------------------------------------------------
+
+SELECT 'snap_id|stat_name|value' FROM dual;
+
+SELECT snap_id
+  || '|' || stat_name
+  || '|' || value
+FROM   dba_hist_sysstat
+WHERE  dbid = &dbid
+  AND  instance_number = &inst
+  AND  snap_id BETWEEN &begin_snap AND &end_snap
+ORDER BY snap_id, stat_id
+/
@@ -0,0 +1,23 @@
+-------------------------------------------------------------------------------
+-- Title       : system_event.sql
+-- Description : AWR export - Wait events (cumulative values)
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- Parameters  : dbid, inst, begin_snap, end_snap
+-- Output      : Header line and rows of dba_hist_system_event, '|' separated
+-- ----------------------------------------------------------------------------
+
+SELECT 'snap_id|wait_class|event_name|total_waits|total_timeouts|time_waited_micro' FROM dual;
+
+SELECT snap_id
+  || '|' || wait_class
+  || '|' || event_name
+  || '|' || total_waits
+  || '|' || total_timeouts
+  || '|' || time_waited_micro
+FROM   dba_hist_system_event
+WHERE  dbid = &dbid
+  AND  instance_number = &inst
+  AND  snap_id BETWEEN &begin_snap AND &end_snap
+ORDER BY snap_id, event_id
+/
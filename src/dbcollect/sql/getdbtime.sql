@@ -0,0 +1,55 @@
+-------------------------------------------------------------------------------
+-- Title       : getdbtime.sql
+-- Description : DB time and DB CPU per AWR snapshot interval (for --peak)
+-- Author      : Bart Sjerps <bart@dirty-cache.com>
+-- License     : GPLv3+
+-- Parameters  : days:     amount of days ago to start collect period
+--               end_days: not used (same header as getawrs.sql)
+--               inc_rac:  not used
+--               inc_stby: not used
+--               inc_pack: not used
+-- Output      : dbid, inst_num, prev_id, snap_id, dbtime, dbcpu (seconds) in CSV format
+-- ----------------------------------------------------------------------------
+
+SET tab off feedback off verify off heading off lines 1000 pages 0 trims on
+ALTER SESSION SET NLS_NUMERIC_CHARACTERS = '.,';
+WHENEVER SQLERROR EXIT SQL.SQLCODE
+
+WITH INFO AS (
+  SELECT (SELECT MAX(end_interval_time) FROM dba_hist_snapshot) max_time
+  , interval '&days'     DAY(3) ndays
+  , interval '1'         DAY    oneday
+  FROM dual
+)
+, TIMEMODEL AS (
+  SELECT tm.dbid
+  , tm.instance_number
+  , tm.snap_id
+  , s.end_interval_time endtime
+  , nvl(sum(decode(tm.stat_name, 'DB time', tm.value)), 0) dbtime
+  , nvl(sum(decode(tm.stat_name, 'DB CPU',  tm.value)), 0) dbcpu
+  FROM dba_hist_sys_time_model tm
+  JOIN dba_hist_snapshot s ON s.dbid = tm.dbid AND s.instance_number = tm.instance_number AND s.snap_id = tm.snap_id
+  WHERE tm.stat_name IN ('DB time', 'DB CPU')
+  GROUP BY tm.dbid, tm.instance_number, tm.snap_id, s.end_interval_time
+)
+SELECT dbid
+  || ',' || inst_num
+  || ',' || prev_id
+  || ',' || snap_id
+  || ',' || round(nvl(dbtime, 0)/1e6, 1)
+  || ',' || round(nvl(dbcpu, 0)/1e6, 1)
+FROM (SELECT dbid
+  , instance_number inst_num
+  , snap_id
+  , endtime
+  , lag(snap_id) over (PARTITION BY dbid, instance_number ORDER BY snap_id) prev_id
+  , dbtime - lag(dbtime) over (PARTITION BY dbid, instance_number ORDER BY snap_id) dbtime
+  , dbcpu  - lag(dbcpu)  over (PARTITION BY dbid, instance_number ORDER BY snap_id) dbcpu
+  FROM timemodel
+), info
+WHERE prev_id IS NOT NULL                           -- ignore FIRST
+  AND dbtime >= 0                                   -- counters are reset on db restarts
+  AND endtime >= trunc(max_time + oneday - ndays)   -- starting time: ndays BEFORE last snap
+ORDER BY dbid, snap_id, inst_num
+/